@@ -7,9 +7,10 @@ from uuid import uuid4
 # Add src to path
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "../src")))
 
-from cerina.graph import run_full_session
+from cerina.graph import run_full_session, close_graph
 from cerina.state import new_session_state
 from cerina.db import init_db
+from cerina.agents.llm import close_clients
 
 async def main():
     # Ensure tables exist
@@ -32,7 +33,8 @@ async def main():
     )
     
     try:
-        final_state = await run_full_session(initial_state)
+        # Durable, so the session can be approved from the UI afterwards
+        final_state = await run_full_session(initial_state, durable=True)
         
         print("\n=== Session Complete ===")
         print(f"Final Status: {final_state.status}")
@@ -48,6 +50,15 @@ async def main():
         print(f"\n[ERROR] execution failed: {e}")
         import traceback
         traceback.print_exc()
+    finally:
+        await close_graph()
+        await close_clients()
 
 if __name__ == "__main__":
-    asyncio.run(main())
+    # uvloop is optional (not available on Windows); fall back to asyncio's loop
+    try:
+        import uvloop
+    except ImportError:
+        asyncio.run(main())
+    else:
+        uvloop.run(main())
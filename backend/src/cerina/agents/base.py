@@ -1,14 +1,48 @@
-from typing import Dict, Any, Callable
+from typing import Dict, Any, Awaitable, Callable, List, Optional, Sequence
 from datetime import datetime, timezone
+import atexit
 import functools
+import hashlib
+import inspect
+import queue
+import threading
 import time
 from uuid import uuid4
 
-from ..state import FoundryState
-from ..db import SessionLocal, AgentRun
+import orjson
+
+from langgraph.config import get_stream_writer
+
+from ..state import FoundryState, Draft, Review
+from ..db import SessionLocal, AgentRun, DraftRecord
+from .llm import token_usage
 
 StateUpdate = Dict[str, Any]
 AgentFn = Callable[[FoundryState], StateUpdate]
+AsyncAgentFn = Callable[[FoundryState], Awaitable[StateUpdate]]
+
+# State fields snapshotted before an agent runs, unless the agent declares its own.
+# Draft bodies are logged once in the drafts table and referenced by id here;
+# snapshotting them per call grows quadratically with the revision loop.
+LOGGED_FIELDS = ("session_id", "iteration", "status", "user_intent", "current_draft_id", "review_count")
+
+# Small stand-ins for the large state fields, usable in input_fields
+DERIVED_FIELDS: Dict[str, Callable[[FoundryState], Any]] = {
+    "current_draft_id": lambda state: state.current_draft.id if state.current_draft else None,
+    "review_count": lambda state: len(state.reviews),
+    "draft_history_ids": lambda state: [draft.id for draft in state.draft_history],
+}
+
+# AgentRun rows are queued and bulk-inserted by a daemon writer thread, so
+# agents (and the event loop) never wait on the DB. The writer flushes every
+# LOG_BATCH_SIZE records or LOG_FLUSH_INTERVAL_S, whichever comes first.
+LOG_BATCH_SIZE = 32
+LOG_FLUSH_INTERVAL_S = 0.05
+LOG_QUEUE_MAXSIZE = 1024
+
+_log_queue: "queue.Queue[Dict[str, Any]]" = queue.Queue(maxsize=LOG_QUEUE_MAXSIZE)
+_log_writer: threading.Thread | None = None
+_log_writer_lock = threading.Lock()
 
 
 def now_utc() -> datetime:
@@ -16,83 +50,307 @@ def now_utc() -> datetime:
     return datetime.now(timezone.utc)
 
 
-def _serialize_value(value: Any) -> Any:
+def stream_writer() -> Callable[[Any], None]:
+    """
+    LangGraph's custom stream writer for the running node, so agents can push
+    partial output (e.g. draft tokens) to stream_mode="custom" consumers.
+    Returns a no-op when the agent is called outside a graph run.
+    """
+    try:
+        return get_stream_writer()
+    except RuntimeError:
+        return lambda _chunk: None
+
+
+def content_hash(content: str) -> bytes:
+    """Short digest of a draft body, used to spot unchanged drafts."""
+    return hashlib.blake2b(content.encode("utf-8"), digest_size=16).digest()
+
+
+def prior_review(state: FoundryState, agent_name: str) -> Optional[Review]:
     """
-    Best-effort serialization of values for logging.
+    agent_name's latest review of an earlier draft whose content equals the
+    current draft, re-targeted at the current draft with a fresh id.
 
-    - Pydantic models -> dict via model_dump()
-    - Lists -> serialize elements recursively
-    - Dicts -> serialize values recursively
-    - Other types -> returned as-is
+    Revisions (notably APPROVE_CONTINUE cycles and revision-cache hits) can
+    reproduce a draft that was already scored; reusing that review skips a
+    reviewer LLM call. Returns None when there is nothing to reuse.
     """
+    current = state.current_draft
+    if current is None or not state.draft_history:
+        return None
+    digest = content_hash(current.content)
+    same_content = {
+        draft.id for draft in state.draft_history
+        if draft.id != current.id and content_hash(draft.content) == digest
+    }
+    if not same_content:
+        return None
+    for review in reversed(state.reviews):
+        if review.agent_name == agent_name and review.target_draft_id in same_content:
+            return review.model_copy(update={"id": str(uuid4()), "target_draft_id": current.id})
+    return None
+
+
+def _pyd_default(value: Any) -> Any:
     if hasattr(value, "model_dump"):
         return value.model_dump(mode="json")
-    if isinstance(value, list):
-        return [_serialize_value(v) for v in value]
-    if isinstance(value, dict):
-        return {k: _serialize_value(v) for k, v in value.items()}
-    return value
+    return str(value)
 
 
-def log_agent_run(agent_name: str):
+def _to_json(snapshot: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Best-effort serialization of a snapshot for logging, in one orjson pass.
+    Pydantic models are dumped through the default hook; datetimes and other
+    natively supported types never round-trip through Python code.
+    """
+    return orjson.loads(
+        orjson.dumps(snapshot, default=_pyd_default, option=orjson.OPT_NON_STR_KEYS)
+    )
+
+
+def _serialize_result(result: StateUpdate, usage: Dict[str, int] | None = None) -> Dict[str, Any]:
+    """
+    Serialize an agent's state update to a JSON-compatible dict for logging.
+    Drafts are replaced by their ids; see _new_draft_rows.
+    """
+    serialized: Dict[str, Any] = {}
+    for key, value in result.items():
+        if key == "current_draft" and isinstance(value, Draft):
+            serialized["current_draft_id"] = value.id
+        elif key == "draft_history":
+            serialized["draft_history_ids"] = [draft.id for draft in value]
+        else:
+            serialized[key] = value
+    if usage:
+        serialized["token_usage"] = usage
+    return _to_json(serialized)
+
+
+def _new_draft_rows(session_id: str, result: StateUpdate) -> List[Dict[str, Any]]:
+    """DraftRecord rows for the draft an agent produced, if any."""
+    draft = result.get("current_draft")
+    if not isinstance(draft, Draft):
+        return []
+    return [{
+        "id": draft.id,
+        "session_id": session_id,
+        "version_number": draft.version_number,
+        "created_by": draft.created_by,
+        "parent_draft_id": draft.parent_draft_id,
+        "content": draft.content,
+        "created_at": draft.created_at,
+    }]
+
+
+def _input_snapshot(state: FoundryState, input_fields: Sequence[str]) -> Dict[str, Any]:
+    """Serialize only the state fields the agent reads, not the whole state."""
+    snapshot = {}
+    for field in input_fields:
+        derive = DERIVED_FIELDS.get(field)
+        snapshot[field] = derive(state) if derive else getattr(state, field)
+    return _to_json(snapshot)
+
+
+def _run_record(
+    agent_name: str,
+    session_id: str,
+    input_snapshot: Dict[str, Any],
+    output_snapshot: Dict[str, Any],
+    duration_ms: float,
+    error_msg: str | None,
+    drafts: List[Dict[str, Any]],
+) -> Dict[str, Any]:
+    return {
+        "id": str(uuid4()),
+        "session_id": session_id,
+        "agent_name": agent_name,
+        "input_snapshot": input_snapshot,
+        "output_snapshot": output_snapshot,
+        "duration_ms": duration_ms,
+        "error": error_msg,
+        "created_at": datetime.utcnow(),
+        "drafts": drafts,
+    }
+
+
+def _insert_run_records(records: List[Dict[str, Any]]) -> None:
+    """Bulk-insert AgentRun rows and their drafts. Logging failures never crash the agent."""
+    db = None
+    try:
+        db = SessionLocal()
+        runs = []
+        for record in records:
+            record = dict(record)
+            for draft in record.pop("drafts"):
+                db.merge(DraftRecord(**draft))
+            runs.append(AgentRun(**record))
+        db.bulk_save_objects(runs)
+        db.commit()
+    except Exception as log_err:
+        # Logging failures should never crash the agent
+        agents = ", ".join(sorted({r["agent_name"] for r in records}))
+        print(f"[log_agent_run] Failed to log agent run for {agents}: {log_err}")
+    finally:
+        if db is not None:
+            db.close()
+
+
+def reserve_draft(
+    session_id: str,
+    draft_id: str,
+    version_number: int,
+    created_by: str,
+    parent_draft_id: str | None,
+) -> None:
+    """
+    Insert an empty drafts row for a draft that is still being generated.
+    The run-log writer later merges the final content into the same row.
+    Blocking; agents run it via asyncio.to_thread alongside the LLM stream.
+    """
+    db = None
+    try:
+        db = SessionLocal()
+        db.merge(DraftRecord(
+            id=draft_id,
+            session_id=session_id,
+            version_number=version_number,
+            created_by=created_by,
+            parent_draft_id=parent_draft_id,
+            content="",
+        ))
+        db.commit()
+    except Exception as log_err:
+        # Logging failures should never crash the agent
+        print(f"[reserve_draft] Failed to reserve draft {draft_id}: {log_err}")
+    finally:
+        if db is not None:
+            db.close()
+
+
+def _log_writer_loop() -> None:
+    while True:
+        batch = [_log_queue.get()]
+        deadline = time.monotonic() + LOG_FLUSH_INTERVAL_S
+        while len(batch) < LOG_BATCH_SIZE:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(_log_queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        _insert_run_records(batch)
+        for _ in batch:
+            _log_queue.task_done()
+
+
+def _ensure_log_writer() -> None:
+    global _log_writer
+    if _log_writer is not None and _log_writer.is_alive():
+        return
+    with _log_writer_lock:
+        if _log_writer is None or not _log_writer.is_alive():
+            _log_writer = threading.Thread(
+                target=_log_writer_loop, name="agent-run-log", daemon=True
+            )
+            _log_writer.start()
+
+
+def _enqueue_run_record(*args: Any) -> None:
+    record = _run_record(*args)
+    _ensure_log_writer()
+    try:
+        _log_queue.put_nowait(record)
+    except queue.Full:
+        # Writer is falling behind; write inline rather than drop the record.
+        _insert_run_records([record])
+
+
+def flush_run_logs() -> None:
+    """Block until every queued AgentRun record has been written."""
+    if _log_writer is not None and _log_writer.is_alive():
+        _log_queue.join()
+
+
+atexit.register(flush_run_logs)
+
+
+def log_agent_run(agent_name: str, input_fields: Sequence[str] = LOGGED_FIELDS):
     """
     Decorator that logs agent execution to the DB.
 
-    - Captures input state snapshot (as JSON-compatible dict).
-    - Captures output state update (serialized).
+    - Captures a snapshot of the input_fields this agent reads (JSON-compatible).
+      Dumping the whole FoundryState grows with draft_history on every call.
+      Names in DERIVED_FIELDS (e.g. current_draft_id) are computed, not dumped.
+    - Captures output state update (serialized), with drafts stored once in
+      the drafts table and referenced by id.
     - Measures duration in milliseconds.
+    - Records LLM token usage of the run alongside the output.
     - Logs any error message that occurred.
+
+    Works for both plain and async agents; coroutine functions get an async
+    wrapper so they can be awaited concurrently by the graph.
+
+    The DB insert is queued for the background writer; the agent returns
+    immediately.
     """
 
-    def decorator(func: AgentFn):
+    def decorator(func: AgentFn | AsyncAgentFn):
+        if inspect.iscoroutinefunction(func):
+            @functools.wraps(func)
+            async def async_wrapper(state: FoundryState) -> StateUpdate:
+                start_time = time.time()
+                error_msg: str | None = None
+
+                input_snapshot = _input_snapshot(state, input_fields)
+                output_snapshot: Dict[str, Any] = {}
+                drafts: List[Dict[str, Any]] = []
+
+                usage_token = token_usage.set({})
+                try:
+                    result = await func(state)
+                    output_snapshot = _serialize_result(result, token_usage.get())
+                    drafts = _new_draft_rows(state.session_id, result)
+                    return result
+                except Exception as e:
+                    error_msg = str(e)
+                    raise
+                finally:
+                    token_usage.reset(usage_token)
+                    duration_ms = (time.time() - start_time) * 1000.0
+                    _enqueue_run_record(
+                        agent_name, state.session_id, input_snapshot,
+                        output_snapshot, duration_ms, error_msg, drafts,
+                    )
+
+            return async_wrapper
+
         @functools.wraps(func)
         def wrapper(state: FoundryState) -> StateUpdate:
             start_time = time.time()
-            session_id = state.session_id
             error_msg: str | None = None
 
-            # Snapshot of input state (can be large; acceptable for debugging)
-            input_snapshot = state.model_dump(mode="json")
+            input_snapshot = _input_snapshot(state, input_fields)
             output_snapshot: Dict[str, Any] = {}
+            drafts: List[Dict[str, Any]] = []
 
+            usage_token = token_usage.set({})
             try:
                 result = func(state)
-
-                # Serialize result to JSON-compatible dict for logging
-                serialized_result: Dict[str, Any] = {}
-                for key, value in result.items():
-                    serialized_result[key] = _serialize_value(value)
-
-                output_snapshot = serialized_result
+                output_snapshot = _serialize_result(result, token_usage.get())
+                drafts = _new_draft_rows(state.session_id, result)
                 return result
-
             except Exception as e:
                 error_msg = str(e)
                 raise
             finally:
-                end_time = time.time()
-                duration_ms = (end_time - start_time) * 1000.0
-
-                db = None
-                try:
-                    db = SessionLocal()
-                    run_record = AgentRun(
-                        id=str(uuid4()),
-                        session_id=session_id,
-                        agent_name=agent_name,
-                        input_snapshot=input_snapshot,
-                        output_snapshot=output_snapshot,
-                        duration_ms=duration_ms,
-                        error=error_msg,
-                    )
-                    db.add(run_record)
-                    db.commit()
-                except Exception as log_err:
-                    # Logging failures should never crash the agent
-                    print(f"[log_agent_run] Failed to log agent run for {agent_name}: {log_err}")
-                finally:
-                    if db is not None:
-                        db.close()
+                token_usage.reset(usage_token)
+                duration_ms = (time.time() - start_time) * 1000.0
+                _enqueue_run_record(
+                    agent_name, state.session_id, input_snapshot,
+                    output_snapshot, duration_ms, error_msg, drafts,
+                )
 
         return wrapper
 
@@ -0,0 +1,105 @@
+from uuid import uuid4
+from ..state import FoundryState, Review
+from .base import StateUpdate, log_agent_run, prior_review
+from .llm import agenerate_structured, review_excerpt
+from .schemas import CombinedReviewOut
+from .safety import parse_safety_result, safety_fallback
+from .empathy import parse_empathy_result, empathy_fallback
+from .clinical import parse_clinical_result, clinical_fallback
+
+
+@log_agent_run("CombinedCritic")
+async def run_combined_critic(state: FoundryState) -> StateUpdate:
+    """
+    Reviews the draft for safety, empathy and clinical quality in ONE LLM call.
+
+    The draft is by far the largest part of each reviewer prompt, so fusing
+    the three rubrics pays its prefill and network round trip once instead of
+    three times. The merged JSON is split back into the same three Review
+    records the per-agent critics produce, using their parsing logic.
+    """
+    if not state.current_draft:
+        return {}
+
+    # Same content as an already-reviewed draft: reuse all three reviews
+    reused = [prior_review(state, agent) for agent in ("SafetyGuardian", "EmpathyToneAgent", "ClinicalCritic")]
+    if all(reused):
+        safety_review, empathy_review, clinical_review = reused
+        return {
+            "reviews": reused,
+            "safety_score": safety_review.safety_score,
+            "empathy_score": empathy_review.empathy_score,
+            "clinical_score": clinical_review.clinical_score,
+            "scores": {
+                "safety": safety_review.safety_score,
+                "empathy": empathy_review.empathy_score,
+                "clinical": clinical_review.clinical_score,
+            },
+        }
+
+    prompt = f"""
+Target Condition: "{state.user_intent}"
+
+Protocol Draft:
+---
+{review_excerpt(state.current_draft.content)}
+---
+"""
+
+    try:
+        result = await agenerate_structured(
+            prompt=prompt,
+            system_key="CombinedCritic",
+            schema=CombinedReviewOut,
+            temperature=0.2,
+            max_tokens=2048,  # three reviews in one response
+        )
+        safety = parse_safety_result(result.safety)
+        empathy = parse_empathy_result(result.empathy)
+        clinical = parse_clinical_result(result.clinical)
+
+    except Exception as e:
+        print(f"[CombinedCritic] LLM call failed: {e}")
+        safety = safety_fallback(e)
+        empathy = empathy_fallback(e)
+        clinical = clinical_fallback(e)
+
+    draft_id = state.current_draft.id
+    safety_score, safety_summary, safety_rationale = safety
+    empathy_score, empathy_summary, empathy_rationale = empathy
+    clinical_score, clinical_summary, clinical_rationale = clinical
+
+    reviews = [
+        Review(
+            id=str(uuid4()),
+            agent_name="SafetyGuardian",
+            target_draft_id=draft_id,
+            summary=safety_summary,
+            safety_score=safety_score,
+            rationale=safety_rationale,
+        ),
+        Review(
+            id=str(uuid4()),
+            agent_name="EmpathyToneAgent",
+            target_draft_id=draft_id,
+            summary=empathy_summary,
+            empathy_score=empathy_score,
+            rationale=empathy_rationale,
+        ),
+        Review(
+            id=str(uuid4()),
+            agent_name="ClinicalCritic",
+            target_draft_id=draft_id,
+            summary=clinical_summary,
+            clinical_score=clinical_score,
+            rationale=clinical_rationale,
+        ),
+    ]
+
+    return {
+        "reviews": reviews,
+        "safety_score": safety_score,
+        "empathy_score": empathy_score,
+        "clinical_score": clinical_score,
+        "scores": {"safety": safety_score, "empathy": empathy_score, "clinical": clinical_score},
+    }
@@ -1,17 +1,24 @@
 from uuid import uuid4
 from ..state import FoundryState, Draft
-from .base import StateUpdate, now_utc, log_agent_run
-from .llm import generate_text, SYSTEM_PROMPTS
+from .base import StateUpdate, now_utc, log_agent_run, stream_writer
+from .llm import agenerate_text_stream, SYSTEM_PROMPTS
 
 
-@log_agent_run("DraftingAgent")
-def run_drafting_agent(state: FoundryState) -> StateUpdate:
+@log_agent_run(
+    "DraftingAgent",
+    input_fields=("user_intent", "user_context", "scratchpads", "current_draft_id", "iteration"),
+)
+async def run_drafting_agent(state: FoundryState) -> StateUpdate:
     """
     Produces a concise, structured CBT protocol draft using the LLM.
 
     The prompt is deliberately strict to avoid overly long, messy output.
     The model is asked to return a short markdown document with clear sections,
     focusing on actionable protocol steps and (when relevant) an exposure hierarchy.
+
+    The completion is streamed: tokens are forwarded to LangGraph's "custom"
+    stream as they arrive (so a UI can render the draft incrementally) and
+    buffered into the final draft.
     """
     # Notes from intent interpreter, if available
     interpreter_notes = state.scratchpads.notes.get("IntentInterpreter", "")
@@ -120,13 +127,18 @@ Length & style constraints:
 - Tone: clear, professional, and supportive, but concise.
 """
 
+    write = stream_writer()
     try:
-        protocol_content = generate_text(
+        chunks = []
+        async for delta in agenerate_text_stream(
             prompt=prompt,
             system_instruction=SYSTEM_PROMPTS["DraftingAgent"],
             temperature=0.5,
             max_tokens=800,  # keep outputs compact
-        )
+        ):
+            chunks.append(delta)
+            write({"agent": "DraftingAgent", "delta": delta})
+        protocol_content = "".join(chunks)
     except Exception as e:
         print(f"[DraftingAgent] LLM call failed: {e}")
         # Fallback content
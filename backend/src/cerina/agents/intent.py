@@ -1,93 +1,98 @@
+import re
+from typing import Optional
+
 from ..state import FoundryState
 from .base import StateUpdate, log_agent_run
-from .llm import generate_json, SYSTEM_PROMPTS
+from .llm import generate_structured
+from .schemas import IntentOut
+
+# --- Deterministic fast path ---
+# Most requests name one condition and one technique outright ("CBT exposure
+# hierarchy for social anxiety"). Those are resolved locally without an LLM
+# hop; anything ambiguous, risk-related or with extra context goes to the LLM.
+
+_CONDITIONS = [
+    (re.compile(r"\bsocial anxiety\b|\bsocial phobia\b|\bpublic speaking\b", re.I), "social anxiety"),
+    (re.compile(r"\bpanic\b", re.I), "panic disorder"),
+    (re.compile(r"\bocd\b|\bobsessive[- ]compulsive\b", re.I), "obsessive-compulsive disorder"),
+    (re.compile(r"\binsomnia\b|\bsleep problems?\b", re.I), "insomnia"),
+    (re.compile(r"\bphobias?\b|\bfear of\b", re.I), "specific phobia"),
+    (re.compile(r"\bgeneral(?:i[sz]ed)? anxiety\b|\bgad\b|\bworry\b", re.I), "generalized anxiety disorder"),
+    (re.compile(r"\bdepression\b|\blow mood\b", re.I), "depression"),
+]
+
+_APPROACHES = [
+    (re.compile(r"\bexposure\b|\bhierarch(?:y|ies)\b|\berp\b", re.I),
+     "Graded exposure with a SUDS-rated hierarchy, plus cognitive restructuring."),
+    (re.compile(r"\bsleep hygiene\b|\bcbt-i\b|\bsleep restriction\b", re.I),
+     "CBT-I: sleep hygiene, stimulus control and sleep restriction."),
+    (re.compile(r"\bbehaviou?ral activation\b|\bactivity scheduling\b", re.I),
+     "Behavioural activation with activity scheduling and mood monitoring."),
+    (re.compile(r"\bthought records?\b|\bcognitive restructuring\b", re.I),
+     "Cognitive restructuring using thought records."),
+]
+
+# Requests touching on risk always get the LLM's considered notes
+_RISK = re.compile(r"suicid|self[- ]harm|overdose|psychosis|abuse|trauma|ptsd", re.I)
+
+
+def _fast_classify(user_intent: str, user_context: Optional[str]) -> Optional[IntentOut]:
+    """
+    Returns an IntentOut when the request unambiguously names
+    exactly one known condition and one technique, otherwise None.
+    """
+    if (user_context or "").strip() or _RISK.search(user_intent):
+        return None
+
+    conditions = {name for pattern, name in _CONDITIONS if pattern.search(user_intent)}
+    approaches = [approach for pattern, approach in _APPROACHES if pattern.search(user_intent)]
+    if len(conditions) != 1 or len(approaches) != 1:
+        return None
+
+    return IntentOut(
+        normalized_intent=user_intent,
+        target_condition=conditions.pop(),
+        recommended_approach=approaches[0],
+        notes="Resolved by keyword classifier.",
+    )
 
 
-@log_agent_run("IntentInterpreter")
+@log_agent_run("IntentInterpreter", input_fields=("user_intent", "user_context"))
 def run_intent_interpreter(state: FoundryState) -> StateUpdate:
     """
-    Normalizes user intent using the LLM and moves the workflow into DRAFTING.
-    The prompt is constrained to a single, valid JSON object so parsing
-    stays robust and the notes remain concise.
+    Normalizes user intent and moves the workflow into DRAFTING.
+    Clear-cut requests are resolved by _fast_classify; the rest use the LLM.
+    The system prompt (with INTENT_RUBRIC) constrains the reply to a single,
+    valid JSON object so parsing stays robust and the notes remain concise.
     """
     user_intent = state.user_intent.strip()
     user_context = (state.user_context or "None provided").strip()
 
     prompt = f"""
-You are analyzing a request for a CBT protocol.
-
 User Request: "{user_intent}"
 Additional Context: "{user_context}"
-
-Your task is to normalize and structure this request so that downstream
-agents can work with it easily.
-
-Return a SINGLE JSON object and nothing else.
-
-The JSON must have EXACTLY these keys:
-
-{{
-  "normalized_intent": "",
-  "target_condition": "",
-  "specific_requirements": [],
-  "recommended_approach": "",
-  "notes": ""
-}}
-
-Field requirements:
-
-- "normalized_intent": 1–2 clear sentences describing what protocol
-  should be generated (include key goals and modality if obvious).
-
-- "target_condition": a short phrase naming the main problem
-  (e.g., "panic disorder", "social anxiety", "insomnia", "specific phobia").
-
-- "specific_requirements": a list (array) of SHORT strings capturing any
-  explicit constraints or wishes (e.g., "no medication", "focus on exposure",
-  "include sleep hygiene").
-
-- "recommended_approach": 1–2 sentences suggesting appropriate CBT
-  techniques or modules (e.g., "graded exposure", "behavioural activation").
-
-- "notes": any brief additional considerations (e.g., risk factors,
-  comorbidities, or uncertainties about the request).
-
-Formatting rules (VERY IMPORTANT):
-- Return ONLY the JSON object, with no markdown, comments, or extra text.
-- Use valid JSON: double-quoted keys and string values, no trailing commas.
-- Keep fields concise and avoid repetition of the full request text.
 """
 
     try:
-        result = generate_json(
-            prompt=prompt,
-            system_instruction=SYSTEM_PROMPTS["IntentInterpreter"],
-            temperature=0.3,
-        )
-
-        normalized_intent = result.get("normalized_intent", "").strip() or user_intent
-
-        # Ensure specific_requirements is always a list of strings
-        raw_requirements = result.get("specific_requirements", [])
-        if isinstance(raw_requirements, str):
-            specific_requirements = [raw_requirements]
-        else:
-            specific_requirements = [
-                str(item) for item in (raw_requirements or []) if str(item).strip()
-            ]
-
-        target_condition = result.get("target_condition", "").strip() or "Unknown"
-        recommended_approach = (
-            result.get("recommended_approach", "Standard CBT").strip()
-            or "Standard CBT"
-        )
-        extra_notes = result.get("notes", "").strip()
+        result = _fast_classify(user_intent, state.user_context)
+        path = "fast"
+        if result is None:
+            path = "llm"
+            result = generate_structured(
+                prompt=prompt,
+                system_key="IntentInterpreter",
+                schema=IntentOut,
+                temperature=0.3,
+            )
+
+        normalized_intent = result.normalized_intent or user_intent
+        requirements = result.specific_requirements
 
         notes = (
-            f"Target: {target_condition}\n"
-            f"Approach: {recommended_approach}\n"
-            f"Requirements: {', '.join(specific_requirements) if specific_requirements else 'None'}\n"
-            f"Notes: {extra_notes}"
+            f"Target: {result.target_condition}\n"
+            f"Approach: {result.recommended_approach}\n"
+            f"Requirements: {', '.join(requirements) if requirements else 'None'}\n"
+            f"Notes: {result.notes}"
         )
 
     except Exception as e:
@@ -95,9 +100,10 @@ Formatting rules (VERY IMPORTANT):
         print(f"[IntentInterpreter] LLM call failed: {e}")
         normalized_intent = user_intent
         notes = f"Normalized (fallback): {normalized_intent}"
+        path = "fallback"
 
-    new_notes = state.scratchpads.notes.copy()
-    new_notes["IntentInterpreter"] = notes
+    # Only this agent's notes; merge_scratchpads folds them into the state
+    new_notes = {"IntentInterpreter": notes, "IntentInterpreter:path": path}
 
     return {
         "user_intent": normalized_intent,
@@ -3,10 +3,24 @@ Groq LLM Client for CBT Protocol Agents
 Uses OpenAI-compatible API with Groq's fast inference
 """
 import os
-import json
-from typing import Optional
+import asyncio
+import random
+import hashlib
+import functools
+import logging
+from contextlib import asynccontextmanager
+from contextvars import ContextVar
+from typing import Any, AsyncIterator, Dict, Optional, Type, TypeVar
+import httpx
+import orjson
 from dotenv import load_dotenv
-from openai import OpenAI
+from openai import OpenAI, AsyncOpenAI, APIConnectionError, APIStatusError, RateLimitError
+from pydantic import BaseModel, ValidationError
+
+from ..llm_cache import cached_llm
+from ..settings import get_settings
+
+log = logging.getLogger(__name__)
 
 # Load environment variables from .env file
 load_dotenv()
@@ -14,18 +28,128 @@ load_dotenv()
 # Configure Groq client (OpenAI-compatible)
 GROQ_API_KEY = os.getenv("GROQ_API_KEY")
 
-# Initialize the client
+GROQ_BASE_URL = "https://api.groq.com/openai/v1"
+
+# Connection pool shared by every concurrent agent call. Size it to
+# (parallel reviewer agents x concurrent sessions) so TLS sockets are reused
+# and HTTP/2 multiplexes the fan-out instead of reconnecting per request.
+GROQ_MAX_CONNECTIONS = int(os.getenv("GROQ_MAX_CONNECTIONS", "64"))
+GROQ_MAX_KEEPALIVE = int(os.getenv("GROQ_MAX_KEEPALIVE", "32"))
+
+# Initialize the clients (sync for legacy callers, async for concurrent agents)
 client = None
+async_client = None
+_http_client: Optional[httpx.AsyncClient] = None
 if GROQ_API_KEY:
     client = OpenAI(
         api_key=GROQ_API_KEY,
-        base_url="https://api.groq.com/openai/v1",
+        base_url=GROQ_BASE_URL,
+    )
+    _http_client = httpx.AsyncClient(
+        http2=True,
+        limits=httpx.Limits(
+            max_connections=GROQ_MAX_CONNECTIONS,
+            max_keepalive_connections=GROQ_MAX_KEEPALIVE,
+        ),
+        timeout=httpx.Timeout(60.0, connect=5.0),
+    )
+    async_client = AsyncOpenAI(
+        api_key=GROQ_API_KEY,
+        base_url=GROQ_BASE_URL,
+        http_client=_http_client,
+        max_retries=0,  # retries are handled by _create_with_retry below
     )
 
+# Bound on in-flight async Groq requests across all agents and sessions, so
+# reviewer fan-out stays within QPM limits instead of triggering 429 storms.
+# Set with LLM_CONCURRENCY (see Settings).
+GROQ_MAX_CONCURRENCY = get_settings().LLM_CONCURRENCY
+LLM_MAX_ATTEMPTS = 5
+# Longest a single retry sleeps, whatever Retry-After asks for
+LLM_MAX_RETRY_DELAY = 10.0
+# Created on first use by _semaphore_for(), on the loop that uses it
+_llm_semaphore: Optional[asyncio.Semaphore] = None
+_llm_semaphore_loop: Optional[asyncio.AbstractEventLoop] = None
+
+
+def _semaphore_for(loop: asyncio.AbstractEventLoop) -> asyncio.Semaphore:
+    """The semaphore bounding in-flight requests, one per event loop."""
+    global _llm_semaphore, _llm_semaphore_loop
+
+    if _llm_semaphore is None or _llm_semaphore_loop is not loop:
+        _llm_semaphore, _llm_semaphore_loop = asyncio.Semaphore(GROQ_MAX_CONCURRENCY), loop
+    return _llm_semaphore
+
+
+@asynccontextmanager
+async def llm_slot() -> AsyncIterator[None]:
+    """Hold one of the GROQ_MAX_CONCURRENCY request slots for the block."""
+    async with _semaphore_for(asyncio.get_running_loop()):
+        yield
+
+
+def _is_retryable(error: Exception) -> bool:
+    if isinstance(error, (RateLimitError, APIConnectionError)):
+        return True
+    return isinstance(error, APIStatusError) and error.status_code >= 500
+
+
+def _retry_delay(error: Exception, attempt: int) -> float:
+    """
+    Honor Retry-After when the server sends it, else exponential backoff;
+    capped at LLM_MAX_RETRY_DELAY and jittered so throttled callers spread out.
+    """
+    jitter = random.random() * 0.1
+    response = getattr(error, "response", None)
+    retry_after = response.headers.get("retry-after") if response is not None else None
+    if retry_after:
+        try:
+            return min(max(float(retry_after), 0.0), LLM_MAX_RETRY_DELAY) + jitter
+        except ValueError:
+            pass
+    return min((2 ** attempt) * 0.25, LLM_MAX_RETRY_DELAY) + jitter
+
+
+async def _create_with_retry(**kwargs: Any) -> Any:
+    """
+    chat.completions.create on the async client, retrying rate limits, 5xx
+    and connection errors. Callers hold an llm_slot() around this call.
+    """
+    for attempt in range(LLM_MAX_ATTEMPTS):
+        try:
+            return await async_client.chat.completions.create(**kwargs)
+        except (RateLimitError, APIStatusError, APIConnectionError) as e:
+            if not _is_retryable(e) or attempt == LLM_MAX_ATTEMPTS - 1:
+                raise
+            await asyncio.sleep(_retry_delay(e, attempt))
+
+
+async def close_clients() -> None:
+    """Drain the shared async connection pool. Call once at process shutdown."""
+    if async_client is not None:
+        await async_client.close()
+    if _http_client is not None and not _http_client.is_closed:
+        await _http_client.aclose()
+
 # Default model - using Llama 3.1 8B Instant for fast inference
 DEFAULT_MODEL = "llama-3.1-8b-instant"
 
+SchemaT = TypeVar("SchemaT", bound=BaseModel)
+
+# Token usage accumulated by the LLM calls of the current agent run.
+# log_agent_run sets a fresh dict per run and stores it with the AgentRun.
+token_usage: ContextVar[Optional[Dict[str, int]]] = ContextVar("token_usage", default=None)
+
 
+def _record_usage(usage: Any) -> None:
+    totals = token_usage.get()
+    if totals is None or usage is None:
+        return
+    for field in ("prompt_tokens", "completion_tokens", "total_tokens"):
+        totals[field] = totals.get(field, 0) + (getattr(usage, field, 0) or 0)
+
+
+@cached_llm("text")
 def generate_text(
     prompt: str,
     system_instruction: Optional[str] = None,
@@ -49,27 +173,137 @@ def generate_text(
     if not client:
         raise ValueError("GROQ_API_KEY not found in environment variables")
 
-    messages = []
-    if system_instruction:
-        messages.append({"role": "system", "content": system_instruction})
-    messages.append({"role": "user", "content": prompt})
+    response = client.chat.completions.create(
+        model=model_name,
+        messages=_text_messages(prompt, system_instruction),
+        temperature=temperature,
+        max_tokens=max_tokens,
+    )
+
+    _record_usage(response.usage)
+    return response.choices[0].message.content or ""
+
+
+@cached_llm("text")
+async def agenerate_text(
+    prompt: str,
+    system_instruction: Optional[str] = None,
+    model_name: str = DEFAULT_MODEL,
+    temperature: float = 0.7,
+    max_tokens: int = 1024,
+) -> str:
+    """
+    Async variant of generate_text, so agents can await Groq concurrently.
+    """
+    if not async_client:
+        raise ValueError("GROQ_API_KEY not found in environment variables")
+
+    async with llm_slot():
+        response = await _create_with_retry(
+            model=model_name,
+            messages=_text_messages(prompt, system_instruction),
+            temperature=temperature,
+            max_tokens=max_tokens,
+        )
+
+    _record_usage(response.usage)
+    return response.choices[0].message.content or ""
+
+
+async def agenerate_text_stream(
+    prompt: str,
+    system_instruction: Optional[str] = None,
+    model_name: str = DEFAULT_MODEL,
+    temperature: float = 0.7,
+    max_tokens: int = 1024,
+) -> AsyncIterator[str]:
+    """
+    Stream generated text from Groq, yielding content deltas as they arrive.
+
+    Streaming bypasses the response cache. Token usage is still recorded
+    from the final usage chunk.
+    """
+    if not async_client:
+        raise ValueError("GROQ_API_KEY not found in environment variables")
+
+    # The slot is held for the whole stream: the request is in flight until
+    # the last chunk arrives.
+    async with llm_slot():
+        stream = await _create_with_retry(
+            model=model_name,
+            messages=_text_messages(prompt, system_instruction),
+            temperature=temperature,
+            max_tokens=max_tokens,
+            stream=True,
+            stream_options={"include_usage": True},
+        )
+
+        async for chunk in stream:
+            if chunk.usage is not None:
+                _record_usage(chunk.usage)
+            if chunk.choices and chunk.choices[0].delta.content:
+                yield chunk.choices[0].delta.content
+
+
+@cached_llm("json", resolve_system=lambda key: FINAL_SYSTEM[key])
+def _complete_json(
+    prompt: str,
+    system_instruction: Optional[str] = None,
+    model_name: str = DEFAULT_MODEL,
+    temperature: float = 0.3,
+    max_tokens: int = 1024,
+    system_key: Optional[str] = None,
+) -> str:
+    """
+    Run a JSON-mode completion and return the raw message content.
+
+    Cached as the immutable string, so every caller decodes exactly once,
+    straight into whatever shape it needs (dict or schema).
+    """
+    if not client:
+        raise ValueError("GROQ_API_KEY not found in environment variables")
 
     response = client.chat.completions.create(
         model=model_name,
-        messages=messages,
+        messages=_json_messages(prompt, system_instruction, system_key),
         temperature=temperature,
         max_tokens=max_tokens,
+        response_format={"type": "json_object"},
     )
 
+    _record_usage(response.usage)
     return response.choices[0].message.content or ""
 
 
-def generate_json(
+@cached_llm("json", resolve_system=lambda key: FINAL_SYSTEM[key])
+async def _acomplete_json(
     prompt: str,
     system_instruction: Optional[str] = None,
     model_name: str = DEFAULT_MODEL,
     temperature: float = 0.3,
-) -> dict:
+    max_tokens: int = 1024,
+    system_key: Optional[str] = None,
+) -> str:
+    """
+    Async variant of _complete_json.
+    """
+    if not async_client:
+        raise ValueError("GROQ_API_KEY not found in environment variables")
+
+    async with llm_slot():
+        response = await _create_with_retry(
+            model=model_name,
+            messages=_json_messages(prompt, system_instruction, system_key),
+            temperature=temperature,
+            max_tokens=max_tokens,
+            response_format={"type": "json_object"},
+        )
+
+    _record_usage(response.usage)
+    return response.choices[0].message.content or ""
+
+
+def generate_json(prompt: str, system_instruction: Optional[str] = None, **kwargs: Any) -> dict:
     """
     Generate structured JSON output using Groq API.
 
@@ -78,49 +312,367 @@ def generate_json(
         system_instruction: Optional system instruction
         model_name: Model to use
         temperature: Lower temperature for more deterministic JSON
+        max_tokens: Maximum tokens to generate
+        system_key: SYSTEM_PROMPTS key; uses the prebuilt FINAL_SYSTEM
+            message and takes precedence over system_instruction
 
     Returns:
         Parsed JSON dictionary
     """
-    if not client:
-        raise ValueError("GROQ_API_KEY not found in environment variables")
+    content = _complete_json(prompt, system_instruction, **kwargs)
+    try:
+        return _parse_json(content)
+    except orjson.JSONDecodeError:
+        _complete_json.forget(prompt, system_instruction, **kwargs)
+        raise
 
-    full_system = (system_instruction or "") + (
-        "\n\nYou must respond with valid JSON only. "
-        "No markdown, no explanation, no surrounding text. "
-        "Do not wrap in ```json blocks."
-    )
 
-    messages = [
+async def agenerate_json(prompt: str, system_instruction: Optional[str] = None, **kwargs: Any) -> dict:
+    """
+    Async variant of generate_json, used by the parallel reviewer agents.
+    """
+    content = await _acomplete_json(prompt, system_instruction, **kwargs)
+    try:
+        return _parse_json(content)
+    except orjson.JSONDecodeError:
+        await _acomplete_json.forget(prompt, system_instruction, **kwargs)
+        raise
+
+
+def generate_structured(
+    prompt: str,
+    schema: Type[SchemaT],
+    system_instruction: Optional[str] = None,
+    **kwargs: Any,
+) -> SchemaT:
+    """
+    JSON completion decoded straight into a pydantic schema (see agents/schemas.py).
+
+    The 8B Groq models only support json_object mode, not server-enforced
+    json_schema, so the shape is enforced locally. model_validate_json parses
+    the raw text in pydantic-core in one pass, with no intermediate dict.
+    """
+    content = _complete_json(prompt, system_instruction, **kwargs)
+    try:
+        return _decode_structured(schema, content)
+    except ValidationError:
+        # Don't let the cache replay a truncated/invalid response on retry
+        _complete_json.forget(prompt, system_instruction, **kwargs)
+        raise
+
+
+async def agenerate_structured(
+    prompt: str,
+    schema: Type[SchemaT],
+    system_instruction: Optional[str] = None,
+    **kwargs: Any,
+) -> SchemaT:
+    """
+    Async variant of generate_structured, used by the reviewer agents.
+    """
+    content = await _acomplete_json(prompt, system_instruction, **kwargs)
+    try:
+        return _decode_structured(schema, content)
+    except ValidationError:
+        await _acomplete_json.forget(prompt, system_instruction, **kwargs)
+        raise
+
+
+def _text_messages(prompt: str, system_instruction: Optional[str]) -> list:
+    messages = []
+    if system_instruction:
+        messages.append({"role": "system", "content": system_instruction})
+    messages.append({"role": "user", "content": prompt})
+    return messages
+
+
+_seen_system_prompts: set = set()
+
+
+def _log_system_fingerprint(system: str) -> None:
+    """
+    Log each distinct system prompt's hash once per process.
+
+    Provider prefix caching only hits when the system message is
+    byte-identical across calls, so a drifting hash here means a variable
+    field leaked into a system prompt.
+    """
+    fingerprint = hashlib.sha1(system.encode("utf-8")).hexdigest()
+    if fingerprint not in _seen_system_prompts:
+        _seen_system_prompts.add(fingerprint)
+        log.debug("system prompt sha1=%s (%d chars)", fingerprint, len(system))
+
+
+JSON_SUFFIX = (
+    "\n\nYou must respond with valid JSON only. "
+    "No markdown, no explanation, no surrounding text. "
+    "Do not wrap in ```json blocks."
+)
+
+
+def _json_messages(
+    prompt: str, system_instruction: Optional[str], system_key: Optional[str] = None
+) -> list:
+    if system_key:
+        full_system = FINAL_SYSTEM[system_key]
+    else:
+        full_system = (system_instruction or "") + JSON_SUFFIX
+        _log_system_fingerprint(full_system)
+
+    return [
         {"role": "system", "content": full_system},
         {"role": "user", "content": prompt},
     ]
 
-    response = client.chat.completions.create(
-        model=model_name,
-        messages=messages,
-        temperature=temperature,
-        max_tokens=1024,
-        response_format={"type": "json_object"},
-    )
 
-    text = (response.choices[0].message.content or "").strip()
-    
+def _parse_json(content: Optional[str]) -> dict:
+    # response_format=json_object guarantees bare JSON, so no fence stripping
+    try:
+        return orjson.loads(content or "")
+    except orjson.JSONDecodeError as e:
+        log.warning("Invalid JSON from model: %s", e)
+        raise
+
+
+def _decode_structured(schema: Type[SchemaT], content: str) -> SchemaT:
     try:
-        return json.loads(text)
-    except json.JSONDecodeError:
-        # Try to extract JSON from common wrappers like ```json ... ```
-        if text.startswith("```json"):
-            text = text[7:]
-        if text.startswith("```"):
-            text = text[3:]
-        if text.endswith("```"):
-            text = text[:-3]
-        text = text.strip()
-        return json.loads(text)
-
-
-# System prompts for each agent
+        return schema.model_validate_json(content)
+    except ValidationError as e:
+        log.warning("Invalid %s JSON from model: %d error(s)", schema.__name__, e.error_count())
+        raise
+
+
+# Reviewers see at most this much of a draft; past it they add no signal and
+# the extra prefill is pure cost.
+REVIEW_DRAFT_MAX_TOKENS = 2000
+CHARS_PER_TOKEN = 4  # heuristic used when tiktoken is unavailable
+TOKENIZER_ENCODING = "cl100k_base"  # close enough to Llama's for budgeting
+TRUNCATION_MARKER = "\n... [truncated for length] ...\n"
+
+
+@functools.lru_cache(maxsize=4)
+def _encoder(encoding: str = TOKENIZER_ENCODING):
+    """
+    Load a tiktoken encoding once per process; None if tiktoken is missing or
+    the encoding cannot be loaded (get_encoding downloads the BPE file on
+    first use, which fails offline). None is cached too, so callers fall back
+    to the CHARS_PER_TOKEN heuristic without retrying the download.
+    """
+    try:
+        import tiktoken
+        return tiktoken.get_encoding(encoding)
+    except Exception as e:
+        log.warning("tiktoken unavailable, estimating tokens from characters: %s", e)
+        return None
+
+
+def truncate_middle(text: str, n: int = REVIEW_DRAFT_MAX_TOKENS) -> str:
+    """Keep the first and last 40% of an n-token budget, dropping the middle of longer text."""
+    if len(text) <= n:
+        return text
+    encoder = _encoder()
+    if encoder is None:
+        if len(text) <= n * CHARS_PER_TOKEN:
+            return text
+        keep = int(n * CHARS_PER_TOKEN * 0.4)
+        return text[:keep] + TRUNCATION_MARKER + text[-keep:]
+    tokens = encoder.encode(text)
+    if len(tokens) <= n:
+        return text
+    keep = int(n * 0.4)
+    return encoder.decode(tokens[:keep]) + TRUNCATION_MARKER + encoder.decode(tokens[-keep:])
+
+
+def review_excerpt(text: str) -> str:
+    """
+    The draft excerpt shown to every reviewer (the three critics and
+    CombinedCritic), so a score never depends on which path reviewed the
+    draft. Long drafts lose their middle rather than their tail, where safety
+    guidance (crisis lines, stop rules) tends to sit.
+    """
+    return truncate_middle(text, REVIEW_DRAFT_MAX_TOKENS)
+
+
+# --- Static rubrics ---
+# The "JSON must have EXACTLY..." schema and field rules for each JSON agent.
+# They are appended to the agent's system prompt once at import, so they are
+# not re-sent in every user prompt and the system prefix stays cacheable.
+
+INTENT_RUBRIC = """
+You are analyzing a request for a CBT protocol. Normalize and structure it
+so that downstream agents can work with it easily.
+
+Return a SINGLE JSON object and nothing else.
+
+The JSON must have EXACTLY these keys:
+
+{
+  "normalized_intent": "",
+  "target_condition": "",
+  "specific_requirements": [],
+  "recommended_approach": "",
+  "notes": ""
+}
+
+Field requirements:
+
+- "normalized_intent": 1–2 clear sentences describing what protocol
+  should be generated (include key goals and modality if obvious).
+
+- "target_condition": a short phrase naming the main problem
+  (e.g., "panic disorder", "social anxiety", "insomnia", "specific phobia").
+
+- "specific_requirements": a list (array) of SHORT strings capturing any
+  explicit constraints or wishes (e.g., "no medication", "focus on exposure",
+  "include sleep hygiene").
+
+- "recommended_approach": 1–2 sentences suggesting appropriate CBT
+  techniques or modules (e.g., "graded exposure", "behavioural activation").
+
+- "notes": any brief additional considerations (e.g., risk factors,
+  comorbidities, or uncertainties about the request).
+
+Formatting rules (VERY IMPORTANT):
+- Return ONLY the JSON object, with no markdown, comments, or extra text.
+- Use valid JSON: double-quoted keys and string values, no trailing commas.
+- Keep fields concise and avoid repetition of the full request text.
+""".strip()
+
+SAFETY_RUBRIC = """
+For each protocol you receive:
+- Identify safety risks, contraindications, and pacing issues.
+- Check for missing crisis/safety guidance.
+- Rate the overall safety of this protocol.
+
+Return a SINGLE JSON object and nothing else.
+
+The JSON must have EXACTLY these keys:
+
+{
+  "safety_score": 0.0,
+  "summary": "",
+  "concerns": [],
+  "recommendations": [],
+  "rationale": ""
+}
+
+Field requirements:
+
+- "safety_score": a float between 0.0 and 1.0
+  (1.0 = completely safe and well-scaffolded,
+   0.5 = usable with significant caution,
+   0.0 = clearly dangerous or inappropriate).
+
+- "summary": 1–2 concise sentences giving the overall safety assessment.
+
+- "concerns": 0–6 SHORT bullet points (each <= 25 words)
+  listing specific safety issues (e.g., "Exposure jumps too quickly from mild to extreme").
+
+- "recommendations": 1–6 SHORT bullet points (each <= 25 words)
+  with concrete safety improvements (e.g., "Add crisis line info", "Slow down hierarchy progression").
+
+- "rationale": 3–6 sentences (<= 150 words) explaining why you chose
+  the safety_score, referencing the most important concerns and recommendations.
+
+Formatting rules (VERY IMPORTANT):
+- Return ONLY the JSON object, with no markdown, headings, or extra text.
+- Use valid JSON: double-quoted keys and string values, no comments, no trailing commas.
+- Do NOT repeat the full protocol text in any field.
+- Be direct, practical, and concise.
+""".strip()
+
+EMPATHY_RUBRIC = """
+For each protocol you receive, assess the following dimensions:
+1. Warmth and validation
+2. Non-judgmental language
+3. Hope and encouragement
+4. Self-efficacy messaging
+5. Cultural sensitivity and inclusivity
+6. Accessibility of language
+7. Motivational elements
+8. Therapeutic alliance building
+
+Return a SINGLE JSON object and nothing else.
+
+The JSON must have EXACTLY these keys:
+
+{
+  "empathy_score": 0.0,
+  "summary": "",
+  "strengths": [],
+  "improvements": [],
+  "rationale": ""
+}
+
+Field requirements:
+
+- "empathy_score": float between 0.0 and 1.0
+  (1.0 = excellent empathy and warmth, 0.0 = cold/harsh/invalidating).
+
+- "summary": 1–2 concise sentences giving the overall tone assessment.
+
+- "strengths": 2–5 SHORT bullet points (each <= 20 words)
+  describing what the protocol does well in terms of empathy and tone.
+
+- "improvements": 2–5 SHORT bullet points (each <= 20 words)
+  describing concrete ways to make the tone more empathetic or accessible.
+
+- "rationale": 3–6 sentences (<= 120 words) explaining why you chose
+  the empathy_score, referring to the most important strengths and improvements.
+
+Formatting rules (VERY IMPORTANT):
+- Return ONLY the JSON object, with no markdown, headings, or extra text.
+- Use valid JSON: double-quoted keys and string values, no comments, no trailing commas.
+- Do NOT repeat the full protocol text in any field.
+- Be specific and concise, not verbose.
+""".strip()
+
+CLINICAL_RUBRIC = """
+For each protocol you receive, evaluate its clinical validity and CBT quality
+and return a SINGLE JSON object. Do not include any text before or after the JSON.
+
+The JSON must have EXACTLY these keys:
+
+{
+  "clinical_score": 0.0,
+  "summary": "",
+  "strengths": [],
+  "gaps": [],
+  "evidence_base": "",
+  "rationale": ""
+}
+
+Field requirements (follow these strictly):
+
+- "clinical_score": a float between 0.0 and 1.0
+  (1.0 = excellent CBT validity, 0.0 = clinically unsound).
+
+- "summary": 1–2 concise sentences giving the overall clinical assessment.
+
+- "strengths": 2–5 SHORT bullet points (each <= 20 words)
+  describing what is clinically sound or well-structured.
+
+- "gaps": 2–5 SHORT bullet points (each <= 20 words)
+  describing missing or weak clinical elements and suggested improvements.
+
+- "evidence_base": 1–3 sentences connecting the protocol to CBT principles.
+  No formal citations or long literature reviews.
+
+- "rationale": 3–6 sentences (<= 150 words) explaining why you chose
+  the clinical_score, referring to the most important strengths and gaps.
+
+Important formatting rules:
+- Return ONLY the JSON object, with no markdown, headings, or commentary.
+- Use valid JSON: double-quoted keys and string values, no comments, no trailing commas.
+- Do NOT repeat the full protocol text in any field.
+- Be concise and specific, not verbose.
+""".strip()
+
+
+# System prompts for each agent.
+# Rubrics and JSON schemas belong in the system message rather than the user
+# prompt: it is then byte-identical across calls, which maximizes provider
+# prefix-cache hits, and user prompts carry only the variable fields.
 SYSTEM_PROMPTS = {
     "IntentInterpreter": """
 You are an expert clinical psychologist specializing in CBT (Cognitive Behavioral Therapy).
@@ -156,7 +708,7 @@ Guidelines:
 - Provide a safety score between 0.0 and 1.0.
 - Highlight concrete risks and practical mitigations.
 - Be direct and concise; avoid repeating the whole protocol.
-- Output structured JSON as requested by the caller.
+- Output structured JSON exactly as specified below.
 """.strip(),
 
     "EmpathyToneAgent": """
@@ -170,7 +722,7 @@ Guidelines:
 - Provide an empathy score between 0.0 and 1.0.
 - Emphasize validation, hope, non-judgment, and accessibility.
 - Keep feedback concrete, short, and easy to apply.
-- Output structured JSON as requested by the caller.
+- Output structured JSON exactly as specified below.
 """.strip(),
 
     "ClinicalCritic": """
@@ -184,7 +736,66 @@ Guidelines:
 - Provide a clinical score between 0.0 and 1.0.
 - Identify key strengths and gaps concisely.
 - Avoid rewriting the protocol; give targeted, high-yield feedback.
-- Output structured JSON as requested by the caller.
+- Output structured JSON exactly as specified below.
+""".strip(),
+
+    "CombinedCritic": """
+You are a review panel for CBT protocols combining three expert reviewers:
+a clinical safety reviewer, a therapeutic communication (empathy) expert,
+and a senior CBT clinician.
+
+For each protocol you receive, review it ONCE from all three perspectives
+and return a SINGLE JSON object with EXACTLY these top-level keys:
+
+{
+  "safety": {
+    "safety_score": 0.0,
+    "summary": "",
+    "concerns": [],
+    "recommendations": [],
+    "rationale": ""
+  },
+  "empathy": {
+    "empathy_score": 0.0,
+    "summary": "",
+    "strengths": [],
+    "improvements": [],
+    "rationale": ""
+  },
+  "clinical": {
+    "clinical_score": 0.0,
+    "summary": "",
+    "strengths": [],
+    "gaps": [],
+    "evidence_base": "",
+    "rationale": ""
+  }
+}
+
+Field requirements:
+
+- Scores are floats between 0.0 and 1.0.
+  safety: 1.0 = completely safe and well-scaffolded, 0.0 = clearly dangerous.
+  empathy: 1.0 = excellent warmth and validation, 0.0 = cold/harsh/invalidating.
+  clinical: 1.0 = excellent CBT validity, 0.0 = clinically unsound.
+
+- "summary": 1–2 concise sentences per perspective.
+
+- List fields ("concerns", "recommendations", "strengths", "improvements",
+  "gaps"): 1–5 SHORT bullet points each (<= 25 words).
+  Safety concerns cover harm, contraindications, pacing and missing crisis guidance.
+  Empathy covers warmth, non-judgment, hope, self-efficacy and accessibility.
+  Clinical covers evidence-based techniques, structure and behavioral targets.
+
+- "evidence_base": 1–3 sentences connecting the protocol to CBT principles.
+
+- "rationale": 3–5 sentences (<= 120 words) explaining each score.
+
+Formatting rules (VERY IMPORTANT):
+- Return ONLY the JSON object, with no markdown, headings, or extra text.
+- Use valid JSON: double-quoted keys and string values, no comments, no trailing commas.
+- Do NOT repeat the full protocol text in any field.
+- Judge each perspective independently; be concise and specific.
 """.strip(),
 
     "RevisionAgent": """
@@ -201,3 +812,16 @@ Guidelines:
 - Output clean, well-formatted markdown as requested by the caller.
 """.strip(),
 }
+
+for _agent, _rubric in {
+    "IntentInterpreter": INTENT_RUBRIC,
+    "SafetyGuardian": SAFETY_RUBRIC,
+    "EmpathyToneAgent": EMPATHY_RUBRIC,
+    "ClinicalCritic": CLINICAL_RUBRIC,
+}.items():
+    SYSTEM_PROMPTS[_agent] = f"{SYSTEM_PROMPTS[_agent]}\n\n{_rubric}"
+
+# Final JSON-mode system messages, built once so the per-call path is a dict
+# lookup. Select them with generate_json(..., system_key=<agent>). They are
+# constant by construction, so they skip _log_system_fingerprint.
+FINAL_SYSTEM = {key: prompt.strip() + JSON_SUFFIX for key, prompt in SYSTEM_PROMPTS.items()}
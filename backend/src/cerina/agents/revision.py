@@ -1,11 +1,105 @@
+import asyncio
+import hashlib
+from typing import List, Tuple
 from uuid import uuid4
-from ..state import FoundryState, Draft
-from .base import StateUpdate, now_utc, log_agent_run
-from .llm import generate_text, SYSTEM_PROMPTS
+from ..llm_cache import LLMResponseCache
+from ..state import FoundryState, Draft, Review
+from .base import StateUpdate, now_utc, log_agent_run, reserve_draft, stream_writer
+from .llm import agenerate_text_stream, SYSTEM_PROMPTS
+
+# L0 dedup: trivial feedback often repeats the same (draft, review summaries)
+# pair across iterations; reuse the earlier revision instead of an LLM call.
+REVISION_CACHE_SIZE = 128
+_revision_cache = LLMResponseCache(maxsize=REVISION_CACHE_SIZE)
+
+# Later iterations are small edits, not rewrites: the output budget shrinks
+# per iteration, and from LATE_ITERATION on the temperature drops and only
+# the LATE_MAX_REVIEWS most severe reviews are sent.
+REVISION_MAX_TOKENS = 900
+REVISION_MIN_TOKENS = 300
+REVISION_TOKENS_STEP = 150
+LATE_ITERATION = 3
+LATE_MAX_REVIEWS = 3
+
+
+# Static half of the revision prompt. It is identical on every call, so it is
+# appended to the system prompt once here rather than re-sent after the draft,
+# which lets provider-side prefix caching reuse the prefill for it.
+_REVISION_SYSTEM_TEMPLATE = """
+Your job is to produce a REVISED version of the protocol that:
+
+- Addresses ALL important concerns raised by reviewers (safety, empathy, clinical).
+- Preserves the existing section structure and headings as much as possible.
+- Keeps the protocol SHORT, clear, and clinically usable.
+- DOES NOT add long theory lectures, multi-page psychoeducation, or new complex sections.
+- Resolves obvious contradictions between reviewers in a reasonable way.
+
+Output format (VERY IMPORTANT):
+- Output MUST be valid, well-formatted MARKDOWN only.
+- Keep the same overall section outline as the current draft when possible
+  (e.g., Summary, Core CBT Steps, Exposure Hierarchy, Homework).
+- If you add or remove a section, explain it briefly in the text (one short sentence).
+
+Length constraints:
+- TOTAL length of the revised protocol must be UNDER 600 words.
+- Avoid repeating the original request or long reviewer text.
+- Focus on concrete steps, clear hierarchy, and practical guidance.
+""".strip()
+
+REVISION_SYSTEM = f"{SYSTEM_PROMPTS['RevisionAgent']}\n\n{_REVISION_SYSTEM_TEMPLATE}"
+
+
+def _revision_key(session_id: str, user_intent: str, content: str, reviews: List[Review]) -> str:
+    """
+    Content-hash key over the session, the intent, the draft and its sorted
+    review summaries. Scoped to the session so one session's revision is
+    never replayed into another's draft.
+    """
+    digest = hashlib.blake2b(digest_size=16)
+    digest.update(session_id.encode("utf-8"))
+    digest.update(b"||")
+    digest.update(user_intent.encode("utf-8"))
+    digest.update(b"||")
+    digest.update(content.encode("utf-8"))
+    digest.update(b"||")
+    digest.update(b"||".join(sorted(r.summary.encode("utf-8") for r in reviews)))
+    return digest.hexdigest()
+
+
+def _revision_params(iteration: int) -> Tuple[int, float]:
+    """(max_tokens, temperature) for a revision at the given iteration."""
+    max_tokens = max(REVISION_MIN_TOKENS, REVISION_MAX_TOKENS - REVISION_TOKENS_STEP * iteration)
+    temperature = 0.4 if iteration < LATE_ITERATION else 0.1
+    return max_tokens, temperature
+
+
+def _severity(review: Review) -> float:
+    """Lowest score a review gives; lower means more severe."""
+    scores = [s for s in (review.safety_score, review.empathy_score, review.clinical_score) if s is not None]
+    return min(scores, default=1.0)
+
+
+def _format_review(review: Review) -> str:
+    """Compact prompt view of one review: summary, scores and key rationale."""
+    score_str = ", ".join(filter(None, [
+        f"Safety={review.safety_score:.2f}" if review.safety_score is not None else None,
+        f"Empathy={review.empathy_score:.2f}" if review.empathy_score is not None else None,
+        f"Clinical={review.clinical_score:.2f}" if review.clinical_score is not None else None,
+    ])) or "No numeric scores."
+    return f"""
+### {review.agent_name}
+Summary: {review.summary}
+Scores: {score_str}
+Key points:
+{review.rationale}
+"""
 
 
-@log_agent_run("RevisionAgent")
-def run_revision_agent(state: FoundryState) -> StateUpdate:
+@log_agent_run(
+    "RevisionAgent",
+    input_fields=("user_intent", "current_draft_id", "reviews", "iteration"),
+)
+async def run_revision_agent(state: FoundryState) -> StateUpdate:
     """
     Revises the current CBT protocol draft based on reviewer feedback.
 
@@ -14,6 +108,10 @@ def run_revision_agent(state: FoundryState) -> StateUpdate:
     - Preserve the existing section structure and headings.
     - Keep the protocol concise and well-formatted markdown.
     - Avoid expanding into long psychoeducational essays.
+
+    The completion is streamed like the drafting agent's. The new draft's id
+    is allocated up front and its drafts row is reserved while tokens arrive,
+    so that DB round trip overlaps generation instead of following it.
     """
     current_draft = state.current_draft
     if not current_draft:
@@ -24,32 +122,15 @@ def run_revision_agent(state: FoundryState) -> StateUpdate:
         r for r in state.reviews
         if r.target_draft_id == current_draft.id
     ]
+    if state.iteration >= LATE_ITERATION:
+        relevant_reviews = sorted(relevant_reviews, key=_severity)[:LATE_MAX_REVIEWS]
 
     # Format reviews for the prompt (summaries + key rationale only)
-    reviews_text = ""
-    for review in relevant_reviews:
-        # Build a compact view of each review
-        score_bits = []
-        if review.safety_score is not None:
-            score_bits.append(f"Safety={review.safety_score:.2f}")
-        if review.empathy_score is not None:
-            score_bits.append(f"Empathy={review.empathy_score:.2f}")
-        if review.clinical_score is not None:
-            score_bits.append(f"Clinical={review.clinical_score:.2f}")
-        score_str = ", ".join(score_bits) if score_bits else "No numeric scores."
-
-        reviews_text += f"""
-### {review.agent_name}
-Summary: {review.summary}
-Scores: {score_str}
-Key points:
-{review.rationale}
-"""
+    reviews_text = "".join(_format_review(review) for review in relevant_reviews)
 
-    # Strict, structure-preserving prompt
+    # Only the per-call fields go in the user turn; the static instructions
+    # live in REVISION_SYSTEM so the prompt prefix is identical across calls.
     prompt = f"""
-You are an expert CBT protocol editor.
-
 Original Request:
 "{state.user_intent}"
 
@@ -61,35 +142,32 @@ Current Draft (Version {current_draft.version_number}):
 Expert Reviews (summarized):
 {reviews_text if reviews_text else "No reviews available yet."}
 
-Your job is to produce a REVISED version of the protocol that:
-
-- Addresses ALL important concerns raised by reviewers (safety, empathy, clinical).
-- Preserves the existing section structure and headings as much as possible.
-- Keeps the protocol SHORT, clear, and clinically usable.
-- DOES NOT add long theory lectures, multi-page psychoeducation, or new complex sections.
-- Resolves obvious contradictions between reviewers in a reasonable way.
-
-Output format (VERY IMPORTANT):
-- Output MUST be valid, well-formatted MARKDOWN only.
-- Keep the same overall section outline as the current draft when possible
-  (e.g., Summary, Core CBT Steps, Exposure Hierarchy, Homework).
-- If you add or remove a section, explain it briefly in the text (one short sentence).
-
-Length constraints:
-- TOTAL length of the revised protocol must be UNDER 600 words.
-- Avoid repeating the original request or long reviewer text.
-- Focus on concrete steps, clear hierarchy, and practical guidance.
-
 Now write the revised CBT protocol in markdown, replacing the old draft.
 """
 
+    draft_id = str(uuid4())
+    version_number = current_draft.version_number + 1
+    reservation = asyncio.create_task(asyncio.to_thread(
+        reserve_draft, state.session_id, draft_id, version_number, "RevisionAgent", current_draft.id,
+    ))
+
+    max_tokens, temperature = _revision_params(state.iteration)
+    write = stream_writer()
+    dedup_key = _revision_key(state.session_id, state.user_intent, current_draft.content, relevant_reviews)
     try:
-        revised_content = generate_text(
-            prompt=prompt,
-            system_instruction=SYSTEM_PROMPTS["RevisionAgent"],
-            temperature=0.4,
-            max_tokens=900,  # keep revisions compact
-        )
+        revised_content = _revision_cache.get(dedup_key, "revision", "")
+        if revised_content is None:
+            chunks = []
+            async for delta in agenerate_text_stream(
+                prompt=prompt,
+                system_instruction=REVISION_SYSTEM,
+                temperature=temperature,
+                max_tokens=max_tokens,
+            ):
+                chunks.append(delta)
+                write({"agent": "RevisionAgent", "draft_id": draft_id, "delta": delta})
+            revised_content = "".join(chunks)
+            _revision_cache.put(dedup_key, "revision", "", revised_content)
     except Exception as e:
         print(f"[RevisionAgent] LLM call failed: {e}")
         # Fallback: append feedback summary to the draft
@@ -101,13 +179,14 @@ Now write the revised CBT protocol in markdown, replacing the old draft.
         )
 
     new_draft = Draft(
-        id=str(uuid4()),
+        id=draft_id,
         content=revised_content,
         created_at=now_utc(),
         created_by="RevisionAgent",
-        version_number=current_draft.version_number + 1,
+        version_number=version_number,
         parent_draft_id=current_draft.id,
     )
+    await reservation
 
     # Move current draft to history
     new_history = state.draft_history + [current_draft]
@@ -0,0 +1,82 @@
+from typing import Any, List
+
+from pydantic import BaseModel, ConfigDict, ValidationInfo, field_validator
+
+# Defaults used when a reviewer omits or mangles its score
+FALLBACK_SAFETY_SCORE = 0.8  # Default moderately safe score
+FALLBACK_EMPATHY_SCORE = 0.85
+FALLBACK_CLINICAL_SCORE = 0.9
+
+
+class LLMOut(BaseModel):
+    """
+    Base for the typed JSON replies of the agents.
+
+    Groq's json_object mode only guarantees *some* JSON object, so every field
+    is coerced towards its declared default instead of failing validation:
+    missing/null/blank values take the default, floats are clamped to [0, 1]
+    and a bare string where a list is expected becomes a one-item list.
+    """
+
+    model_config = ConfigDict(extra="ignore")
+
+    @field_validator("*", mode="before")
+    @classmethod
+    def _coerce(cls, value: Any, info: ValidationInfo) -> Any:
+        default = cls.model_fields[info.field_name].get_default(call_default_factory=True)
+
+        if value is None or (isinstance(value, str) and not value.strip()):
+            return default
+        if isinstance(default, float):
+            try:
+                return max(0.0, min(1.0, float(value)))
+            except (TypeError, ValueError):
+                return default
+        if isinstance(default, list):
+            if isinstance(value, str):
+                return [value]
+            if isinstance(value, list):
+                return [str(item) for item in value if item is not None and str(item).strip()]
+            return default
+        if isinstance(default, str):
+            return str(value).strip()
+        return value
+
+
+class IntentOut(LLMOut):
+    normalized_intent: str = ""
+    target_condition: str = "Unknown"
+    specific_requirements: List[str] = []
+    recommended_approach: str = "Standard CBT"
+    notes: str = ""
+
+
+class SafetyReviewOut(LLMOut):
+    safety_score: float = FALLBACK_SAFETY_SCORE
+    summary: str = "Safety Assessment"
+    concerns: List[str] = []
+    recommendations: List[str] = []
+    rationale: str = "No detailed rationale provided."
+
+
+class EmpathyReviewOut(LLMOut):
+    empathy_score: float = FALLBACK_EMPATHY_SCORE
+    summary: str = "Tone Assessment"
+    strengths: List[str] = []
+    improvements: List[str] = []
+    rationale: str = "No detailed rationale provided."
+
+
+class ClinicalReviewOut(LLMOut):
+    clinical_score: float = FALLBACK_CLINICAL_SCORE
+    summary: str = "Clinical assessment"
+    strengths: List[str] = []
+    gaps: List[str] = []
+    evidence_base: str = ""
+    rationale: str = "No detailed rationale provided."
+
+
+class CombinedReviewOut(LLMOut):
+    safety: SafetyReviewOut = SafetyReviewOut()
+    empathy: EmpathyReviewOut = EmpathyReviewOut()
+    clinical: ClinicalReviewOut = ClinicalReviewOut()
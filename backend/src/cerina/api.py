@@ -1,16 +1,60 @@
-from fastapi import FastAPI, HTTPException
+import asyncio
+import logging
+import os
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, HTTPException, Depends, Query
 from fastapi.middleware.cors import CORSMiddleware
-from pydantic import BaseModel
-from typing import Optional, Dict, Any, Literal
+from fastapi.responses import JSONResponse
+import orjson
+from pydantic import BaseModel, TypeAdapter
+from langgraph.types import Command
+from typing import Optional, Dict, Any, List, Literal, Tuple
 from uuid import uuid4
-from datetime import datetime
+from datetime import datetime, timezone
 
 from .state import new_session_state, FoundryState, Review, Draft
-from .graph import run_full_session, build_graph
-from .db import init_db
-from langgraph.checkpoint.sqlite.aio import AsyncSqliteSaver
+from .graph import run_full_session, get_graph, close_graph
+from sqlalchemy import tuple_, update
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.orm import Session
+from .db import init_db, get_db, SessionLocal, RunSession, AgentRun
 
-app = FastAPI(title="Cerina Protocol Foundry API")
+logging.basicConfig(level=os.getenv("LOG_LEVEL", "INFO"))
+log = logging.getLogger("cerina.api")
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """
+    Opens the shared checkpointer and compiles the graph at startup, before
+    the first request, instead of reopening SQLite and rebuilding the graph
+    per request; closes the checkpointer on shutdown.
+    """
+    app.state.graph = await get_graph()
+    app.state.checkpointer = app.state.graph.checkpointer
+    try:
+        yield
+    finally:
+        await close_graph()
+
+def _pydantic_default(value: Any) -> Any:
+    if hasattr(value, "model_dump"):
+        return value.model_dump(mode="json")
+    return str(value)
+
+class ORJSONResponse(JSONResponse):
+    """
+    JSON encoded with orjson. Pydantic models are dumped in the same pass;
+    stands in for fastapi.responses.ORJSONResponse, which is deprecated.
+    """
+
+    def render(self, content: Any) -> bytes:
+        return orjson.dumps(content, default=_pydantic_default)
+
+app = FastAPI(
+    title="Cerina Protocol Foundry API",
+    default_response_class=ORJSONResponse,
+    lifespan=lifespan,
+)
 
 # Configure CORS
 origins = ["*"]
@@ -26,6 +70,67 @@ app.add_middleware(
 # Ensure DB is initialized
 init_db()
 
+# One compiled serializer for review lists, instead of a dump per review
+_REVIEWS_ADAPTER = TypeAdapter(List[Review])
+
+def _to_jsonable(value: Any) -> Any:
+    """JSON-compatible copy of value in one orjson pass (models via model_dump)."""
+    return orjson.loads(orjson.dumps(value, default=_pydantic_default))
+
+TERMINAL_STATUSES = ("APPROVED", "FAILED", "REJECTED")
+
+def _utcnow() -> datetime:
+    """
+    Naive UTC, the clock every run_sessions/agent_runs timestamp uses (column
+    defaults and the agent_runs trigger included), so started_at orders and
+    pages correctly whatever the host's timezone.
+    """
+    return datetime.utcnow()
+
+def _as_utc(value: Optional[datetime]) -> Optional[datetime]:
+    """A stored naive-UTC timestamp marked as UTC, so clients convert it to local time."""
+    return value.replace(tzinfo=timezone.utc) if value is not None else None
+
+def _upsert_run_session(db: Session, session_id: str, values: Dict[str, Any]) -> None:
+    """INSERT ... ON CONFLICT(id) DO UPDATE; new rows use the session_id as id."""
+    stmt = sqlite_insert(RunSession).values(id=session_id, session_id=session_id, **values)
+    db.execute(stmt.on_conflict_do_update(index_elements=["id"], set_=values))
+
+def _record_session_status(db: Session, session_id: str, status: str) -> None:
+    """
+    Writes a status change in one UPDATE instead of SELECT-then-mutate.
+    Rows created before id == session_id are matched by session_id; a
+    session without any row gets one via the upsert.
+    """
+    values: Dict[str, Any] = {"status": status}
+    if status in TERMINAL_STATUSES:
+        values["ended_at"] = _utcnow()
+    result = db.execute(
+        update(RunSession).where(RunSession.session_id == session_id).values(**values)
+    )
+    if result.rowcount == 0:
+        _upsert_run_session(db, session_id, values)
+    db.commit()
+
+def _log_session_start(session_id: str, started_at: datetime) -> None:
+    """Record a new session as INIT in its own DB session (blocking)."""
+    with SessionLocal() as db:
+        try:
+            _upsert_run_session(db, session_id, {"status": "INIT", "started_at": started_at})
+            db.commit()
+        except Exception as e:
+            db.rollback()
+            log.warning("Failed to log session start: %s", e)
+
+def _log_session_end(session_id: str, status: str) -> None:
+    """Record the status a session run stopped at (blocking)."""
+    with SessionLocal() as db:
+        try:
+            _record_session_status(db, session_id, status)
+        except Exception as e:
+            db.rollback()
+            log.warning("Failed to update session log: %s", e)
+
 class CreateSessionRequest(BaseModel):
     user_intent: str
     user_context: Optional[str] = None
@@ -35,7 +140,8 @@ class CreateSessionResponse(BaseModel):
     status: str
 
 class HumanApproveRequest(BaseModel):
-    new_content: str
+    # None keeps the current draft as-is (e.g. an unedited approval)
+    new_content: Optional[str] = None
     action: Literal["APPROVE_FINAL", "APPROVE_CONTINUE", "REQUEST_REVISION", "REJECT"]
     comments: Optional[str] = None
 
@@ -43,6 +149,10 @@ class HumanApproveRequest(BaseModel):
 async def create_session(request: CreateSessionRequest):
     """
     Creates a new session and runs it until human approval is needed or it completes/fails.
+
+    The run_sessions log is written in a worker thread, so its synchronous
+    SQLite work does not block the event loop. The INIT row goes in before
+    the run, and a run that raises is recorded as FAILED.
     """
     session_id = str(uuid4())
     initial_state = new_session_state(
@@ -52,191 +162,206 @@ async def create_session(request: CreateSessionRequest):
     )
     
     # Log session creation
-    try:
-        from .db import SessionLocal, RunSession
-        db = SessionLocal()
-        new_run = RunSession(
-            id=str(uuid4()),
-            session_id=session_id,
-            status="INIT",
-            started_at=datetime.now()
-        )
-        db.add(new_run)
-        db.commit()
-        db.close()
-    except Exception as e:
-        print(f"Failed to log session start: {e}")
+    await asyncio.to_thread(_log_session_start, session_id, _utcnow())
     
     try:
         # Run the graph
-        final_state = await run_full_session(initial_state)
-        
-        # Update session status log
-        try:
-            db = SessionLocal()
-            run = db.query(RunSession).filter(RunSession.session_id == session_id).first()
-            if run:
-                run.status = final_state.status
-                if final_state.status in ["APPROVED", "FAILED"]:
-                    run.ended_at = datetime.now()
-                db.commit()
-            db.close()
-        except Exception as e:
-             print(f"Failed to update session log: {e}")
-
-        return {
-            "session_id": session_id,
-            "status": final_state.status
-        }
+        final_state = await run_full_session(initial_state, graph=app.state.graph, durable=True)
     except Exception as e:
+        await asyncio.to_thread(_log_session_end, session_id, "FAILED")
         raise HTTPException(status_code=500, detail=str(e))
 
+    # Update session status log
+    await asyncio.to_thread(_log_session_end, session_id, final_state.status)
+
+    return {
+        "session_id": session_id,
+        "status": final_state.status
+    }
+
 @app.post("/sessions/{session_id}/human_approve")
-async def human_approve(session_id: str, request: HumanApproveRequest):
+async def human_approve(session_id: str, request: HumanApproveRequest, db: Session = Depends(get_db)):
     """
     Applies human edits and approval decision, then resumes the graph.
     """
-    db_path = "cerina_graph.db"
-    
     try:
-        async with AsyncSqliteSaver.from_conn_string(db_path) as checkpointer:
-            graph = build_graph(checkpointer=checkpointer)
-            config = {"configurable": {"thread_id": session_id}}
-            
-            # 1. Get current state
-            snapshot = await graph.aget_state(config)
-            if not snapshot or not snapshot.values:
-                 raise HTTPException(status_code=404, detail="Session not found")
-            
-            current_state = FoundryState(**snapshot.values)
-            
-            # 2. Create a "Human Review" to log the feedback
-            human_review = Review(
-                id=str(uuid4()),
-                agent_name="HumanReviewer",
-                target_draft_id=current_state.current_draft.id if current_state.current_draft else "unknown",
-                summary=f"Human Action: {request.action}",
-                rationale=request.comments or "No comments provided.",
-                safety_score=1.0 if request.action != "REQUEST_REVISION" else None,
-                empathy_score=1.0 if request.action != "REQUEST_REVISION" else None,
-                clinical_score=1.0 if request.action != "REQUEST_REVISION" else None
-            )
-            
-            # 3. Prepare base updates - convert Pydantic objects to dicts for LangGraph
-            # Serialize existing reviews + new human review
-            serialized_reviews = [r.model_dump(mode='json') if hasattr(r, 'model_dump') else r for r in current_state.reviews]
-            serialized_reviews.append(human_review.model_dump(mode='json'))
-            
-            updates: Dict[str, Any] = {
-                "reviews": serialized_reviews
-            }
-            
-            # Update draft content if changed
-            if current_state.current_draft and request.new_content != current_state.current_draft.content:
-                updated_draft = current_state.current_draft.model_copy(update={"content": request.new_content})
-                updates["current_draft"] = updated_draft.model_dump(mode='json')
-            
-            # 4. Handle each action type
-            if request.action == "APPROVE_FINAL":
-                # Mark as approved - graph will route to END
-                updates["status"] = "APPROVED"
-                
-            elif request.action == "APPROVE_CONTINUE":
-                # Let agents do one more revision cycle, then auto-approve
-                # This triggers revision -> safety -> empathy -> clinical -> supervisor -> APPROVED
-                updates["status"] = "REVISING"
-                updates["approve_after_revision"] = True
-                
-            elif request.action == "REQUEST_REVISION":
-                # Send back to revision agent
-                updates["status"] = "REVISING"
-            
-            elif request.action == "REJECT":
-                # User rejected the protocol - end immediately
-                updates["status"] = "REJECTED"
-            
-            # 5. Apply updates to state
-            # Use as_node="await_human" to tell LangGraph this update is from the await_human node
-            # This ensures the graph follows the await_human -> supervisor edge when resuming
-            print(f"[DEBUG] Updating state with: status={updates.get('status')}")
-            await graph.aupdate_state(config, updates, as_node="await_human")
-            
-            # 6. Resume graph execution
-            print(f"[DEBUG] Resuming graph for session {session_id}")
-            result = await graph.ainvoke(None, config=config)
-            print(f"[DEBUG] Graph result status: {result.get('status') if isinstance(result, dict) else 'unknown'}")
-            
-            final_state = FoundryState(**result) if isinstance(result, dict) else result
+        graph = app.state.graph
+        config = {"configurable": {"thread_id": session_id}}
+        
+        # 1. Get current state
+        snapshot = await graph.aget_state(config)
+        if not snapshot or not snapshot.values:
+             raise HTTPException(status_code=404, detail="Session not found")
+        
+        # Drafts/reviews the graph wrote come back as model instances and are
+        # taken as-is (revalidate_instances="never"); only the plain dicts
+        # earlier human_approve calls wrote are validated into models.
+        current_state = FoundryState.model_validate(snapshot.values)
+        
+        # 2. Create a "Human Review" to log the feedback
+        human_review = Review(
+            id=str(uuid4()),
+            agent_name="HumanReviewer",
+            target_draft_id=current_state.current_draft.id if current_state.current_draft else "unknown",
+            summary=f"Human Action: {request.action}",
+            rationale=request.comments or "No comments provided.",
+            safety_score=1.0 if request.action != "REQUEST_REVISION" else None,
+            empathy_score=1.0 if request.action != "REQUEST_REVISION" else None,
+            clinical_score=1.0 if request.action != "REQUEST_REVISION" else None
+        )
+        
+        # 3. Prepare base updates - convert Pydantic objects to dicts for LangGraph
+        # Only the new human review is sent: the merge_reviews reducer appends
+        # it to the reviews already in the checkpoint.
+        updates: Dict[str, Any] = {
+            "reviews": _REVIEWS_ADAPTER.dump_python([human_review], mode="json")
+        }
+        
+        # Update draft content if changed
+        if (
+            current_state.current_draft
+            and request.new_content is not None
+            and request.new_content != current_state.current_draft.content
+        ):
+            updated_draft = current_state.current_draft.model_copy(update={"content": request.new_content})
+            updates["current_draft"] = _to_jsonable(updated_draft)
+        
+        # 4. Handle each action type
+        if request.action == "APPROVE_FINAL":
+            # Mark as approved - graph will route to END
+            updates["status"] = "APPROVED"
             
-            # Update the RunSession table with the new status
-            try:
-                from .db import SessionLocal, RunSession
-                db = SessionLocal()
-                run = db.query(RunSession).filter(RunSession.session_id == session_id).first()
-                if run:
-                    run.status = final_state.status
-                    if final_state.status in ["APPROVED", "FAILED", "REJECTED"]:
-                        run.ended_at = datetime.now()
-                    db.commit()
-                db.close()
-            except Exception as db_err:
-                print(f"Failed to update session log: {db_err}")
+        elif request.action == "APPROVE_CONTINUE":
+            # Let agents do one more revision cycle, then auto-approve
+            # This triggers revision -> safety -> empathy -> clinical -> supervisor -> APPROVED
+            updates["status"] = "REVISING"
+            updates["approve_after_revision"] = True
             
-            return {"status": final_state.status, "session_id": session_id}
+        elif request.action == "REQUEST_REVISION":
+            # Send back to revision agent
+            updates["status"] = "REVISING"
+        
+        elif request.action == "REJECT":
+            # User rejected the protocol - end immediately
+            updates["status"] = "REJECTED"
+        
+        # 5. Apply updates and resume graph execution at the supervisor,
+        # which routes on the human's decision (revision or END)
+        log.debug("Resuming graph for session %s status=%s", session_id, updates.get("status"))
+        result = await graph.ainvoke(Command(update=updates, goto="supervisor"), config=config)
+        log.debug("Graph result status=%s", result.get("status") if isinstance(result, dict) else "unknown")
+        
+        final_state = FoundryState(**result) if isinstance(result, dict) else result
+        
+        # Update the RunSession table with the new status
+        try:
+            _record_session_status(db, session_id, final_state.status)
+        except Exception as db_err:
+            db.rollback()
+            log.warning("Failed to update session log: %s", db_err)
+        
+        return {"status": final_state.status, "session_id": session_id}
 
     except HTTPException:
         raise
     except Exception as e:
-        import traceback
-        print(f"[ERROR] human_approve failed: {e}")
-        traceback.print_exc()
+        log.exception("human_approve failed for session %s", session_id)
         raise HTTPException(status_code=500, detail=str(e))
 
 
+def _parse_session_cursor(cursor: str) -> Tuple[datetime, Optional[str]]:
+    """
+    Splits a list_sessions cursor ("<started_at ISO>|<id>") into its parts.
+    A bare timestamp (no id) is accepted too and pages strictly before it.
+    """
+    stamp, _, row_id = cursor.partition("|")
+    try:
+        started_at = datetime.fromisoformat(stamp)
+    except ValueError:
+        raise HTTPException(status_code=422, detail=f"Invalid cursor: {cursor!r}")
+    if started_at.tzinfo is not None:
+        started_at = started_at.astimezone(timezone.utc).replace(tzinfo=None)
+    return started_at, row_id or None
+
 @app.get("/sessions")
-async def list_sessions():
+async def list_sessions(
+    limit: int = Query(50, ge=1, le=500),
+    before: Optional[str] = None,
+    db: Session = Depends(get_db),
+):
     """
-    Lists all sessions from the database logs, ordered by most recent first.
+    Lists sessions from the database logs, most recent first, one page at a time.
+
+    Keyset pagination: pass the previous page's next_before as ?before= to get
+    the next page. Rows are ordered by (started_at, id), so sessions sharing a
+    started_at are neither skipped nor repeated across pages, and with the
+    (started_at, id) index each page costs O(limit) however large run_sessions
+    grows. next_before is null on the last page.
     """
+    cursor = _parse_session_cursor(before) if before is not None else None
     try:
-        from .db import SessionLocal, RunSession
-        db = SessionLocal()
-        
         # Query sessions ordered by started_at descending (most recent first)
-        sessions = db.query(RunSession).order_by(RunSession.started_at.desc()).all()
+        query = db.query(RunSession).order_by(RunSession.started_at.desc(), RunSession.id.desc())
+        if cursor is not None:
+            started_at, row_id = cursor
+            if row_id is None:
+                query = query.filter(RunSession.started_at < started_at)
+            else:
+                query = query.filter(
+                    tuple_(RunSession.started_at, RunSession.id) < tuple_(started_at, row_id)
+                )
+        sessions = query.limit(limit).all()
         
-        # If empty, fallback to distinct agent runs (slower but works for demo)
-        if not sessions:
-            from sqlalchemy import distinct
-            from .db import AgentRun
-            distinct_ids = db.query(distinct(AgentRun.session_id)).all()
-            # Construct dummy objects (reversed to show recent first)
-            return [{"session_id": row[0], "status": "UNKNOWN", "created_at": None} for row in reversed(distinct_ids)]
+        # If empty, fallback to distinct agent runs. init_db's trigger registers
+        # new sessions in run_sessions, so only older databases reach this.
+        if not sessions and cursor is None:
+            from sqlalchemy import func
+            recent_ids = (
+                db.query(AgentRun.session_id)
+                .group_by(AgentRun.session_id)
+                .order_by(func.max(AgentRun.created_at).desc())
+                .limit(limit)
+                .all()
+            )
+            # Construct dummy objects (most recent first)
+            items = [{"session_id": row[0], "status": "UNKNOWN", "created_at": None} for row in recent_ids]
+            return {"items": items, "next_before": None}
             
-        return [{"session_id": s.session_id, "status": s.status, "created_at": s.started_at} for s in sessions]
+        items = [{"session_id": s.session_id, "status": s.status, "created_at": _as_utc(s.started_at)} for s in sessions]
+        next_before = None
+        last = sessions[-1] if sessions else None
+        if len(sessions) == limit and last.started_at is not None:
+            next_before = f"{_as_utc(last.started_at).isoformat()}|{last.id}"
+        return {"items": items, "next_before": next_before}
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
-    finally:
-        db.close()
 
 @app.get("/sessions/{session_id}/state")
 async def get_session_state(session_id: str):
     """
     Retrieves the latest state for a given session from the checkpointer.
+
+    Reads the latest checkpoint's channel values directly rather than going
+    through graph.aget_state, which also resolves next tasks and interrupts.
+    Channels that were never written (None fields, or fields added after the
+    checkpoint) are filled with the model default, as aget_state would.
     """
-    db_path = "cerina_graph.db"
-    
     try:
-        async with AsyncSqliteSaver.from_conn_string(db_path) as checkpointer:
-            graph = build_graph(checkpointer=checkpointer)
-            config = {"configurable": {"thread_id": session_id}}
-            
-            snapshot = await graph.aget_state(config)
-            
-            if not snapshot or not snapshot.values:
-                raise HTTPException(status_code=404, detail="Session not found or no state available")
-                
-            return snapshot.values
+        config = {"configurable": {"thread_id": session_id}}
+        checkpoint = await app.state.checkpointer.aget(config)
+        if not checkpoint or not checkpoint["channel_values"]:
+            raise HTTPException(status_code=404, detail="Session not found or no state available")
+
+        channel_values = checkpoint["channel_values"]
+        values = {
+            name: channel_values[name] if name in channel_values
+            else field.get_default(call_default_factory=True)
+            for name, field in FoundryState.model_fields.items()
+            if name in channel_values or not field.is_required()
+        }
+
+        # Encode the models straight to bytes; skips jsonable_encoder's walk
+        return ORJSONResponse(values)
             
     except HTTPException:
         raise
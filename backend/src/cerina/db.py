@@ -1,7 +1,8 @@
-from sqlalchemy import create_engine, Column, String, DateTime, Text, Float, Integer, JSON
-from sqlalchemy.orm import declarative_base, sessionmaker
+from sqlalchemy import create_engine, event, text, Index, Column, String, DateTime, Text, Float, Integer, JSON, LargeBinary
+from sqlalchemy.orm import declarative_base, sessionmaker, Session
+from typing import Iterator
 from datetime import datetime
-import json
+import orjson
 
 Base = declarative_base()
 DB_URL = "sqlite:///cerina_graph.db"
@@ -9,11 +10,17 @@ DB_URL = "sqlite:///cerina_graph.db"
 class RunSession(Base):
     __tablename__ = "run_sessions"
     id = Column(String, primary_key=True)  # can reuse session_id or uuid
-    session_id = Column(String, index=True)
+    session_id = Column(String)
     started_at = Column(DateTime, default=datetime.utcnow)
     ended_at = Column(DateTime, nullable=True)
     status = Column(String)
 
+    __table_args__ = (
+        # list_sessions orders by (started_at, id) DESC; walk the index, don't sort
+        Index("ix_run_sessions_started_at_id", started_at.desc(), id.desc()),
+        Index("ix_run_sessions_session_id", session_id),
+    )
+
 class AgentRun(Base):
     __tablename__ = "agent_runs"
     id = Column(String, primary_key=True)
@@ -25,6 +32,30 @@ class AgentRun(Base):
     error = Column(Text, nullable=True)
     created_at = Column(DateTime, default=datetime.utcnow)
 
+    __table_args__ = (
+        Index("ix_agent_runs_created_at", created_at),
+    )
+
+class DraftRecord(Base):
+    """Each agent-produced draft, stored once; run snapshots reference it by id."""
+    __tablename__ = "drafts"
+    id = Column(String, primary_key=True)
+    session_id = Column(String, index=True)
+    version_number = Column(Integer)
+    created_by = Column(String)
+    parent_draft_id = Column(String, nullable=True)
+    content = Column(Text)
+    created_at = Column(DateTime, default=datetime.utcnow)
+
+class LLMCacheEntry(Base):
+    """LLM responses spilled from the in-memory cache (see cerina.llm_cache)."""
+    __tablename__ = "llm_cache"
+    key = Column(String, primary_key=True)
+    namespace = Column(String, index=True)
+    embedding = Column(LargeBinary, nullable=True)  # float32 prompt vector
+    response = Column(Text)  # orjson-encoded value
+    created_at = Column(DateTime, default=datetime.utcnow)
+
 class Event(Base):
     __tablename__ = "events"
     id = Column(String, primary_key=True)
@@ -33,11 +64,63 @@ class Event(Base):
     event_type = Column(String)
     payload_json = Column(JSON)
 
+# One pooled engine per process. Parallel agents, the background run-log
+# writer and API handlers check connections out of this pool instead of
+# reconnecting for every session.
+engine = create_engine(
+    DB_URL,
+    connect_args={"check_same_thread": False},
+    pool_size=10,
+    max_overflow=20,
+    pool_recycle=1800,
+    pool_pre_ping=True,
+    # JSON columns (run snapshots) are encoded/decoded with orjson
+    json_serializer=lambda obj: orjson.dumps(obj).decode(),
+    json_deserializer=orjson.loads,
+)
+
+@event.listens_for(engine, "connect")
+def _set_sqlite_pragmas(dbapi_connection, _connection_record):
+    # WAL lets API reads proceed while the run-log writer commits;
+    # synchronous=NORMAL is durable under WAL and skips an fsync per commit.
+    cursor = dbapi_connection.cursor()
+    cursor.execute("PRAGMA journal_mode=WAL")
+    cursor.execute("PRAGMA synchronous=NORMAL")
+    cursor.close()
+
 def get_engine():
-    return create_engine(DB_URL, connect_args={"check_same_thread": False})
+    return engine
+
+SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+def get_db() -> Iterator[Session]:
+    """FastAPI dependency: one pooled session per request, always closed."""
+    db = SessionLocal()
+    try:
+        yield db
+    finally:
+        db.close()
 
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=get_engine())
+# Give every session that logs an agent run a run_sessions row, so
+# list_sessions can read the small run_sessions table instead of scanning
+# agent_runs. The API's INIT/status upserts (keyed on id=session_id) then
+# fill in the real status.
+RUN_SESSION_TRIGGER = text("""
+CREATE TRIGGER IF NOT EXISTS trg_agent_runs_register_session
+AFTER INSERT ON agent_runs
+WHEN NOT EXISTS (SELECT 1 FROM run_sessions WHERE session_id = NEW.session_id)
+BEGIN
+    INSERT OR IGNORE INTO run_sessions (id, session_id, started_at, status)
+    VALUES (NEW.session_id, NEW.session_id, NEW.created_at, 'UNKNOWN');
+END
+""")
 
 def init_db():
-    engine = get_engine()
     Base.metadata.create_all(bind=engine)
+    # create_all skips tables that already exist, so add indexes introduced
+    # after a database was first created
+    for table in Base.metadata.sorted_tables:
+        for index in table.indexes:
+            index.create(bind=engine, checkfirst=True)
+    with engine.begin() as conn:
+        conn.execute(RUN_SESSION_TRIGGER)
@@ -1,8 +1,14 @@
-from typing import Dict, Any, Literal, Optional
+import asyncio
+import functools
+import os
+from contextlib import aclosing
+from typing import Dict, Any, List, Literal, NamedTuple, Optional, Union
 from langgraph.graph import StateGraph, END
 from langgraph.graph.state import CompiledStateGraph as CompiledGraph
 from langgraph.checkpoint.base import BaseCheckpointSaver
+from langgraph.checkpoint.memory import MemorySaver
 from langgraph.checkpoint.sqlite.aio import AsyncSqliteSaver
+from langgraph.types import Command
 
 from .state import FoundryState
 from .agents.intent import run_intent_interpreter
@@ -11,132 +17,140 @@ from .agents.safety import run_safety_guardian
 from .agents.empathy import run_empathy_tone_agent
 from .agents.clinical import run_clinical_critic
 from .agents.revision import run_revision_agent
+from .agents.combined import run_combined_critic
 
-def run_supervisor(state: FoundryState) -> Dict[str, Any]:
+# Opt-in: run SafetyGuardian ahead of the other critics and skip them when
+# the draft is critically unsafe. Saves two LLM calls on those drafts at the
+# cost of serializing safety before empathy/clinical on every other draft.
+SAFETY_GATE = os.getenv("SAFETY_GATE", "0") == "1"
+
+# Review each draft with one fused LLM call instead of three. All critics go
+# through the same provider and model (llm.DEFAULT_MODEL), so this is the
+# default; COMBINED_CRITIC=0 restores the three parallel critics, as does
+# SAFETY_GATE=1, which needs them. COMBINED_REVIEWERS is accepted as an alias.
+_combined_flag = os.getenv("COMBINED_REVIEWERS") or os.getenv("COMBINED_CRITIC")
+COMBINED_CRITIC = _combined_flag == "1" if _combined_flag is not None else not SAFETY_GATE
+
+# Per-reviewer score a draft needs to pass, and the safety score below
+# which it fails outright
+SAFETY_THRESHOLD = 0.7
+EMPATHY_THRESHOLD = 0.6
+CLINICAL_THRESHOLD = 0.6
+CRITICAL_SAFETY = 0.2
+
+# run_full_session returns as soon as the state reaches one of these
+STOP_STATUSES = frozenset({"AWAITING_HUMAN", "APPROVED", "FAILED", "REJECTED"})
+
+DB_PATH = "cerina_graph.db"
+
+# Applied to the checkpointer's connection once, when get_graph() opens it.
+# WAL keeps API state reads from blocking on checkpoint writes, and
+# synchronous=NORMAL skips the per-commit fsync (still durable under WAL).
+CHECKPOINT_PRAGMAS = """
+PRAGMA journal_mode=WAL;
+PRAGMA synchronous=NORMAL;
+PRAGMA temp_store=MEMORY;
+PRAGMA mmap_size=268435456;
+PRAGMA cache_size=-65536;
+"""
+
+# One checkpointer and compiled graph per process, opened by get_graph()
+_checkpointer_cm = None
+_checkpointer: Optional[AsyncSqliteSaver] = None
+_compiled_graph: Optional[CompiledGraph] = None
+_graph_loop: Optional[asyncio.AbstractEventLoop] = None
+_graph_lock: Optional[asyncio.Lock] = None
+_graph_lock_loop: Optional[asyncio.AbstractEventLoop] = None
+
+class Evaluation(NamedTuple):
+    scores_passing: bool
+    is_critical: bool
+
+def _evaluate(state: FoundryState) -> Evaluation:
+    """Score checks shared by run_supervisor and route_after_safety."""
+    scores = state.scores
+    return Evaluation(
+        scores_passing=scores.passes(SAFETY_THRESHOLD, EMPATHY_THRESHOLD, CLINICAL_THRESHOLD),
+        is_critical=scores.safety is not None and scores.safety < CRITICAL_SAFETY,
+    )
+
+def run_supervisor(state: FoundryState) -> Command[Literal["revision", "__end__"]]:
     """
     Orchestrates the workflow based on agent feedback and iteration counts.
-    Decides whether to revise, approve (await human), or fail.
+    Decides whether to revise, approve (await human), or fail, and returns
+    the status update and the next node together as one Command, so the
+    decision is made in a single pass.
     """
-    # Thresholds
-    SAFETY_THRESHOLD = 0.7
-    EMPATHY_THRESHOLD = 0.6
-    CLINICAL_THRESHOLD = 0.6
-    
+    evaluation = _evaluate(state)
+    scores_passing = evaluation.scores_passing
+
     # 1. Critical Safety Check
-    if state.safety_score is not None and state.safety_score < 0.2:
-         return {
-             "status": "FAILED", 
-             "error": "Critical safety violation detected.",
-             "approve_after_revision": False
-         }
-    
-    # 2. Check for Approval readiness
-    scores_present = (
-        state.safety_score is not None and 
-        state.empathy_score is not None and 
-        state.clinical_score is not None
-    )
-    
-    scores_passing = (
-        scores_present and
-        state.safety_score >= SAFETY_THRESHOLD and
-        state.empathy_score >= EMPATHY_THRESHOLD and
-        state.clinical_score >= CLINICAL_THRESHOLD
-    )
-    
-    # 3. "Approve & Continue Agents" mode
+    if evaluation.is_critical:
+        return Command(
+            update={
+                "status": "FAILED",
+                "error": "Critical safety violation detected.",
+                "approve_after_revision": False,
+            },
+            goto=END,
+        )
+
+    # 2. "Approve & Continue Agents" mode
     # Only check AFTER at least one revision has completed (status becomes "REVIEWING")
     if state.approve_after_revision and state.status == "REVIEWING":
         if scores_passing:
-            return {
-                "status": "APPROVED",
-                "approve_after_revision": False
-            }
-        elif state.iteration >= state.max_iterations:
-            return {
-                "status": "FAILED",
-                "error": "Max iterations reached without meeting quality thresholds.",
-                "approve_after_revision": False
-            }
+            return Command(
+                update={"status": "APPROVED", "approve_after_revision": False},
+                goto=END,
+            )
+        if state.iteration >= state.max_iterations:
+            return Command(
+                update={
+                    "status": "FAILED",
+                    "error": "Max iterations reached without meeting quality thresholds.",
+                    "approve_after_revision": False,
+                },
+                goto=END,
+            )
         # Otherwise, continue revising (no state change needed)
-        return {}
-    
-    # 4. Normal flow: check if ready for human review
-    if scores_passing and state.iteration >= 1:
-        return {}
+        return Command(goto="revision")
 
-    # 5. Check max iterations
-    if state.iteration >= state.max_iterations:
-        if not scores_passing:
-            return {
+    # 3. Check max iterations
+    if state.iteration >= state.max_iterations and not scores_passing:
+        return Command(
+            update={
                 "status": "FAILED",
-                "error": "Max iterations reached without meeting quality thresholds."
-            }
-    
-    return {}
-
-def await_human(state: FoundryState) -> Dict[str, Any]:
-    """
-    Halts execution and waits for human input.
-    """
-    return {"status": "AWAITING_HUMAN"}
+                "error": "Max iterations reached without meeting quality thresholds.",
+            },
+            goto=END,
+        )
 
-def route_supervisor(state: FoundryState) -> Literal["await_human", "revision", "FAILED", "approved"]:
-    """
-    Determines the next node after supervisor.
-    """
-    if state.status == "FAILED":
-        return "FAILED"
-    
-    if state.status == "APPROVED":
-        return "approved"
-    
-    # Check if we should move to revising based on explicit status
+    # 4. A status the human chose (on resume) routes as-is
+    if state.status in ("FAILED", "APPROVED", "REJECTED"):
+        return Command(goto=END)
     if state.status == "REVISING":
-        return "revision"
+        return Command(goto="revision")
 
-    # Thresholds
-    SAFETY_THRESHOLD = 0.7
-    EMPATHY_THRESHOLD = 0.6
-    CLINICAL_THRESHOLD = 0.6
-    
-    scores_present = (
-        state.safety_score is not None and 
-        state.empathy_score is not None and 
-        state.clinical_score is not None
-    )
-    
-    scores_passing = (
-        scores_present and
-        state.safety_score >= SAFETY_THRESHOLD and
-        state.empathy_score >= EMPATHY_THRESHOLD and
-        state.clinical_score >= CLINICAL_THRESHOLD
-    )
-    
-    # Handle REJECTED status - end immediately
-    if state.status == "REJECTED":
-        return "rejected"
-    
-    # "Approve & Continue Agents" mode: skip human review, auto-approve when ready
-    # Only check AFTER at least one revision has completed (status becomes "REVIEWING")
-    if state.approve_after_revision and state.status == "REVIEWING":
-        if scores_passing:
-            return "approved"
-        elif state.iteration < state.max_iterations:
-            return "revision"
-        else:
-            return "FAILED"
-    
-    # Normal flow: wait for human when scores pass
+    # 5. Normal flow: stop and wait for the human when scores pass
     if scores_passing and state.iteration >= 1:
-        return "await_human"
-    
-    if state.iteration < state.max_iterations:
-        return "revision"
-        
-    return "FAILED"
+        return Command(update={"status": "AWAITING_HUMAN"}, goto=END)
+
+    return Command(goto="revision")
+
+def route_after_safety(state: FoundryState) -> Union[str, List[str]]:
+    """
+    With the safety gate on: send a critically unsafe draft straight to the
+    supervisor (which fails it), otherwise fan out to the remaining critics.
+    """
+    if _evaluate(state).is_critical:
+        return "supervisor"
+    return ["empathy", "clinical"]
 
-def build_graph(checkpointer: Optional[BaseCheckpointSaver] = None) -> CompiledGraph:
+def build_graph(
+    checkpointer: Optional[BaseCheckpointSaver] = None,
+    combined_critic: Optional[bool] = None,
+    safety_gate: Optional[bool] = None,
+) -> CompiledGraph:
     """
     Builds the LangGraph state graph with PARALLEL critic execution.
     
@@ -147,7 +161,7 @@ def build_graph(checkpointer: Optional[BaseCheckpointSaver] = None) -> CompiledG
        intent_interpreter → drafting → [safety, empathy, clinical] (PARALLEL) → supervisor
     
     2. Supervisor Decision:
-       supervisor → await_human (if scores pass, wait for human)
+       supervisor → END with AWAITING_HUMAN (if scores pass, wait for human)
                  → revision (if scores need improvement)
                  → END (APPROVED or FAILED)
     
@@ -155,23 +169,55 @@ def build_graph(checkpointer: Optional[BaseCheckpointSaver] = None) -> CompiledG
        revision → [safety, empathy, clinical] (PARALLEL) → supervisor
     
     4. Human-in-the-Loop:
-       await_human (INTERRUPTED) → supervisor (on resume)
+       The graph is resumed with Command(update=<human decision>, goto="supervisor"),
+       so the supervisor routes on the human's status (revision or END).
     
+    With combined_critic (default: COMBINED_CRITIC env flag), the three critics
+    are replaced by a single combined_critic node that reviews all three
+    dimensions in one LLM call and emits the same three reviews.
+
+    With safety_gate (default: SAFETY_GATE env flag) and separate critics,
+    drafting/revision feed only safety; route_after_safety then either jumps
+    to the supervisor (score below CRITICAL_SAFETY) or fans out to empathy
+    and clinical, which fan in to the supervisor as usual.
+
     The critics (SafetyGuardian, EmpathyToneAgent, ClinicalCritic) run in parallel.
-    Each returns {"reviews": [its_review], "X_score": score}.
-    The merge_reviews reducer in FoundryState combines all reviews automatically.
+    They are coroutines, so LangGraph awaits the whole fan-out superstep together
+    (asyncio.gather semantics) and review wall-clock is max(latency), not the sum.
+    Each returns {"reviews": [its_review], "X_score": score, "scores": {"X": score}}.
+    The merge_reviews reducer in FoundryState combines all reviews automatically;
+    merge_scores folds the compact scores the supervisor gates on, so routing
+    never reads the Review list.
+
+    The graph shape depends only on the two flags, so it is compiled once per
+    flag combination; each call returns a shallow copy bound to checkpointer.
     """
+    if combined_critic is None:
+        combined_critic = COMBINED_CRITIC
+    if safety_gate is None:
+        safety_gate = SAFETY_GATE
+    return _compile_graph(combined_critic, safety_gate).copy(update={"checkpointer": checkpointer})
+
+@functools.lru_cache(maxsize=4)
+def _compile_graph(combined_critic: bool, safety_gate: bool) -> CompiledGraph:
+    """Compiles the graph for build_graph, without a checkpointer."""
+    critics = ["combined_critic"] if combined_critic else ["safety", "empathy", "clinical"]
+    # Nodes that drafting and revision fan out to
+    entry_critics = ["safety"] if safety_gate and not combined_critic else critics
+
     builder = StateGraph(FoundryState)
     
     # Add Nodes
     builder.add_node("intent_interpreter", run_intent_interpreter)
     builder.add_node("drafting", run_drafting_agent)
-    builder.add_node("safety", run_safety_guardian)
-    builder.add_node("empathy", run_empathy_tone_agent)
-    builder.add_node("clinical", run_clinical_critic)
+    if combined_critic:
+        builder.add_node("combined_critic", run_combined_critic)
+    else:
+        builder.add_node("safety", run_safety_guardian)
+        builder.add_node("empathy", run_empathy_tone_agent)
+        builder.add_node("clinical", run_clinical_critic)
     builder.add_node("revision", run_revision_agent)
     builder.add_node("supervisor", run_supervisor)
-    builder.add_node("await_human", await_human)
     
     # Set Entry Point
     builder.set_entry_point("intent_interpreter")
@@ -182,94 +228,135 @@ def build_graph(checkpointer: Optional[BaseCheckpointSaver] = None) -> CompiledG
     builder.add_edge("intent_interpreter", "drafting")
     
     # Fan-out: Drafting triggers all three critics in PARALLEL
-    builder.add_edge("drafting", "safety")
-    builder.add_edge("drafting", "empathy")
-    builder.add_edge("drafting", "clinical")
-    
+    for critic in entry_critics:
+        builder.add_edge("drafting", critic)
+
+    if entry_critics != critics:
+        # Safety gate: safety decides whether the other critics run at all
+        builder.add_conditional_edges(
+            "safety", route_after_safety, ["supervisor", "empathy", "clinical"]
+        )
+        fan_in = ["empathy", "clinical"]
+    else:
+        fan_in = critics
+
     # Fan-in: All three critics converge to supervisor
-    builder.add_edge("safety", "supervisor")
-    builder.add_edge("empathy", "supervisor")
-    builder.add_edge("clinical", "supervisor")
+    for critic in fan_in:
+        builder.add_edge(critic, "supervisor")
     
-    # ==========================================
-    # SUPERVISOR: Conditional routing
-    # ==========================================
-    builder.add_conditional_edges(
-        "supervisor",
-        route_supervisor,
-        {
-            "await_human": "await_human",
-            "revision": "revision",
-            "FAILED": END,
-            "approved": END,
-            "rejected": END
-        }
-    )
+    # (The supervisor routes itself: it returns Command(goto=revision | END))
     
     # ==========================================
     # REVISION LOOP: Revision → Parallel Critics
     # ==========================================
-    builder.add_edge("revision", "safety")
-    builder.add_edge("revision", "empathy")
-    builder.add_edge("revision", "clinical")
+    for critic in entry_critics:
+        builder.add_edge("revision", critic)
     # (Critics already have edges to supervisor from above)
-    
-    # ==========================================
-    # HUMAN-IN-THE-LOOP: Resume path
-    # ==========================================
-    builder.add_edge("await_human", "supervisor")
-    
-    # Compile with interrupt after await_human for human review
-    return builder.compile(checkpointer=checkpointer, interrupt_after=["await_human"])
 
-async def run_full_session(initial_state: FoundryState, thread_id: str = None, resume_input: dict = None) -> FoundryState:
+    return builder.compile()
+
+def _graph_lock_for(loop: asyncio.AbstractEventLoop) -> asyncio.Lock:
+    """The lock guarding get_graph's lazy open, one per event loop."""
+    global _graph_lock, _graph_lock_loop
+
+    if _graph_lock is None or _graph_lock_loop is not loop:
+        _graph_lock, _graph_lock_loop = asyncio.Lock(), loop
+    return _graph_lock
+
+async def get_graph() -> CompiledGraph:
+    """
+    The process-wide compiled graph over a single AsyncSqliteSaver.
+
+    The checkpointer is opened and the graph compiled on first use, then
+    reused by every session, so neither SQLite nor the DAG is rebuilt per
+    run. Concurrent first callers wait on a lock and share one connection.
+    The aiosqlite connection belongs to the event loop that opened it; a
+    call from another loop (e.g. a second asyncio.run) closes the previous
+    connection and opens a fresh one.
+    """
+    global _checkpointer_cm, _checkpointer, _compiled_graph, _graph_loop
+
+    loop = asyncio.get_running_loop()
+    if _compiled_graph is not None and _graph_loop is loop:
+        return _compiled_graph
+    async with _graph_lock_for(loop):
+        if _compiled_graph is None or _graph_loop is not loop:
+            await close_graph()
+            checkpointer_cm = AsyncSqliteSaver.from_conn_string(DB_PATH)
+            checkpointer = await checkpointer_cm.__aenter__()
+            try:
+                await checkpointer.conn.executescript(CHECKPOINT_PRAGMAS)
+            except BaseException:
+                await checkpointer_cm.__aexit__(None, None, None)
+                raise
+            _checkpointer_cm, _checkpointer, _graph_loop = checkpointer_cm, checkpointer, loop
+            _compiled_graph = build_graph(checkpointer=checkpointer)
+    return _compiled_graph
+
+async def close_graph() -> None:
+    """Close the shared checkpointer opened by get_graph() (call on shutdown)."""
+    global _checkpointer_cm, _checkpointer, _compiled_graph, _graph_loop
+
+    checkpointer_cm = _checkpointer_cm
+    _checkpointer_cm = _checkpointer = _compiled_graph = _graph_loop = None
+    if checkpointer_cm is not None:
+        await checkpointer_cm.__aexit__(None, None, None)
+
+async def run_full_session(
+    initial_state: FoundryState,
+    thread_id: str = None,
+    resume_input: dict = None,
+    graph=None,
+    durable: bool = False,
+) -> FoundryState:
     """
     Runs the graph until completion (END) or halt.
     
-    If resume_input is provided, it resumes the graph from the last checkpoint
-    using that input (Command in newer LangGraph, or just updating state).
+    If resume_input is provided, it is applied to the last checkpoint and the
+    graph resumes at the supervisor.
+
+    Runs on the graph passed in if any. Otherwise durable picks the
+    checkpointer: True uses the shared SQLite-backed graph from get_graph(),
+    which a later human_approve can resume; False checkpoints in a one-off
+    MemorySaver, skipping SQLite writes on every node transition for runs
+    nobody resumes.
     """
     if not thread_id:
         thread_id = initial_state.session_id
-    
-    # Use a local file path
-    db_path = "cerina_graph.db"
-    
-    async with AsyncSqliteSaver.from_conn_string(db_path) as checkpointer:
-        graph = build_graph(checkpointer=checkpointer)
-        
-        config = {"configurable": {"thread_id": thread_id}}
-        
-        # If resuming, we usually pass None as input if we just want to continue,
-        # or a Command/update if we want to change state.
-        # Since we modify state outside (in API) before calling this, 
-        # we can just invoke with None (or empty dict) to resume.
-        # HOWEVER, if we are starting fresh, we pass initial_state.
-        
-        input_data = initial_state if not resume_input else None
-        
-        # NOTE: In LangGraph with checkpointer, invoking with same thread_id 
-        # resumes from last checkpoint.
-        # If input_data is provided (initial_state), it might reset or merge depending on config.
-        # But `ainvoke` typically runs from current state.
-        # If we want to resume, we pass Command(resume=...) or just null input?
-        # Actually, if we pass a state update, it merges.
-        
-        if resume_input:
-             # We are resuming. We might need to pass `None` to just "tick" the graph
-             # or pass the state update if we made one.
-             # But the API handler will have updated the state in DB? 
-             # No, the API handler usually updates state via `update_state` or similar, 
-             # OR we pass the update here.
-             
-             # Let's assume the API handler calls `graph.update_state` OR passes the new values here.
-             # We'll support passing dictionary updates here.
-             input_to_use = resume_input
-        else:
-             input_to_use = initial_state
-
-        result = await graph.ainvoke(input_to_use, config=config)
-        
-        if isinstance(result, dict):
-            return FoundryState(**result)
-        return result
+
+    if graph is None:
+        if resume_input and not durable:
+            raise ValueError("resume_input needs durable=True (or a graph) to find the checkpoint")
+        graph = await get_graph() if durable else build_graph(checkpointer=MemorySaver())
+
+    config = {"configurable": {"thread_id": thread_id}}
+
+    if resume_input:
+        # Resume: apply the update and hand control back to the supervisor,
+        # which routes on it (the supervisor has no static outgoing edges).
+        input_to_use = Command(update=resume_input, goto="supervisor")
+    else:
+        input_to_use = initial_state
+
+    # Stream state snapshots and stop at the first terminal one, rather than
+    # letting ainvoke drain the run and assemble the final state separately.
+    # The first snapshot is the starting state, which may carry a status set
+    # before resuming, so only snapshots produced by nodes are checked.
+    result = None
+    async with aclosing(graph.astream(input_to_use, config=config, stream_mode="values")) as stream:
+        async for snapshot in stream:
+            is_start = result is None
+            result = snapshot
+            status = snapshot.get("status") if isinstance(snapshot, dict) else snapshot.status
+            if not is_start and status in STOP_STATUSES:
+                break
+
+    if result is None:
+        # Nothing left to run on this thread; report the checkpointed state
+        result = (await graph.aget_state(config)).values
+
+    if isinstance(result, dict):
+        # Node-written drafts/reviews are reused as-is (revalidate_instances=
+        # "never"); only dicts written from outside the graph get validated
+        return FoundryState.model_validate(result)
+    return result
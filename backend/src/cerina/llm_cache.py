@@ -0,0 +1,368 @@
+"""
+Response cache for the Groq LLM helpers in cerina.agents.llm.
+
+Reviewers are often re-run on an unchanged or near-identical draft (retries,
+revision loops that only touch one section), so repeated requests are
+answered locally instead of paying the LLM round trip.
+
+- Tier 1 is an exact-match LRU keyed by (kind, model, temperature, system,
+  prompt, ...).
+- With LLM_CACHE_SPILL=1 (off by default), LRU-evicted entries spill to the
+  llm_cache table in cerina_graph.db and are promoted back on a hit. Only
+  evicted entries are written, so what is still in memory at shutdown is
+  lost; the spill extends capacity rather than persisting the cache. The
+  table is created on first use, so callers need not run init_db() first.
+- Tier 2 is an opt-in semantic lookup over MiniLM prompt embeddings (cosine
+  >= LLM_SEMANTIC_THRESHOLD), scoped to the same (kind, model, temperature,
+  system) namespace so a new model, temperature or system prompt version
+  never reuses stale answers.
+"""
+import os
+import asyncio
+import hashlib
+import functools
+import inspect
+import logging
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Optional
+
+import orjson
+
+from .db import SessionLocal, LLMCacheEntry
+
+log = logging.getLogger(__name__)
+
+LLM_CACHE_SIZE = int(os.getenv("LLM_CACHE_SIZE", "1024"))
+LLM_CACHE_SPILL = os.getenv("LLM_CACHE_SPILL", "0") == "1"
+LLM_SEMANTIC_CACHE = os.getenv("LLM_SEMANTIC_CACHE", "0") == "1"
+LLM_SEMANTIC_THRESHOLD = float(os.getenv("LLM_SEMANTIC_THRESHOLD", "0.87"))
+SEMANTIC_EMBEDDING_MODEL = "sentence-transformers/all-MiniLM-L6-v2"
+
+
+def _digest(text: str) -> str:
+    return hashlib.blake2b(text.encode("utf-8"), digest_size=16).hexdigest()
+
+
+@functools.lru_cache(maxsize=1)
+def _embedder():
+    """Load the sentence embedding model once; None if it is not installed."""
+    try:
+        from sentence_transformers import SentenceTransformer
+    except ImportError:
+        return None
+    return SentenceTransformer(SEMANTIC_EMBEDDING_MODEL)
+
+
+class LLMResponseCache:
+    """
+    Thread-safe LRU of LLM responses with an optional SQLite spill tier and
+    an optional semantic tier. Values must be orjson-serializable.
+    """
+
+    def __init__(self, maxsize: int = LLM_CACHE_SIZE, semantic: bool = False,
+                 threshold: float = LLM_SEMANTIC_THRESHOLD, spill: bool = False,
+                 session_factory: Callable = SessionLocal):
+        self.maxsize = maxsize
+        self.semantic = semantic
+        self.threshold = threshold
+        self.spill = spill
+        self._session_factory = session_factory
+        # key -> (namespace, value)
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+        # namespace -> (list of normalized prompt vectors, list of exact keys)
+        self._vectors: dict = {}
+        self._loaded_namespaces: set = set()
+        self._spill_error_logged = False
+        self._table_ready = False
+        self._lock = threading.Lock()
+
+    @property
+    def _blocking(self) -> bool:
+        """True when a lookup/store may touch SQLite or the embedding model."""
+        return self.spill or self.semantic
+
+    def get(self, key: str, namespace: str, prompt: str) -> Any:
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                return self._entries[key][1]
+        value = self._spilled_get(key)
+        if value is not None:
+            self._remember(key, namespace, value)
+            return value
+        if not self.semantic:
+            return None
+        return self._semantic_get(namespace, prompt)
+
+    def put(self, key: str, namespace: str, prompt: str, value: Any) -> None:
+        vector = self._embed(prompt) if self.semantic else None
+        self._remember(key, namespace, value)
+        if vector is not None:
+            self._index(namespace, key, vector)
+            # Store the vector now so the semantic tier can be rebuilt later
+            self._spill([(key, namespace, value, vector)])
+
+    async def aget(self, key: str, namespace: str, prompt: str) -> Any:
+        """get() for coroutines: memory hits inline, SQLite/embedding work in a thread."""
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                return self._entries[key][1]
+        if not self._blocking:
+            return None
+        return await asyncio.to_thread(self.get, key, namespace, prompt)
+
+    async def aput(self, key: str, namespace: str, prompt: str, value: Any) -> None:
+        """put() for coroutines; spills and embeddings run off the event loop."""
+        if not self._blocking:
+            self.put(key, namespace, prompt, value)
+            return
+        await asyncio.to_thread(self.put, key, namespace, prompt, value)
+
+    def discard(self, key: str) -> None:
+        """Drop key from memory and the spill table (e.g. a response that failed to decode)."""
+        with self._lock:
+            self._entries.pop(key, None)
+        if not self.spill:
+            return
+        db = None
+        try:
+            db = self._session_factory()
+            self._ensure_table(db)
+            db.query(LLMCacheEntry).filter(LLMCacheEntry.key == key).delete()
+            db.commit()
+        except Exception as e:
+            self._log_spill_error(e)
+        finally:
+            if db is not None:
+                db.close()
+
+    async def adiscard(self, key: str) -> None:
+        """discard() for coroutines."""
+        if not self.spill:
+            self.discard(key)
+            return
+        await asyncio.to_thread(self.discard, key)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._vectors.clear()
+            self._loaded_namespaces.clear()
+
+    def _remember(self, key: str, namespace: str, value: Any) -> None:
+        evicted = []
+        with self._lock:
+            self._entries[key] = (namespace, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                old_key, (old_namespace, old_value) = self._entries.popitem(last=False)
+                evicted.append((old_key, old_namespace, old_value, None))
+        if evicted:
+            self._spill(evicted)
+
+    # --- SQLite spill tier ---
+
+    def _log_spill_error(self, error: Exception) -> None:
+        if not self._spill_error_logged:
+            self._spill_error_logged = True
+            log.warning("SQLite spill unavailable: %s", error)
+
+    def _ensure_table(self, db) -> None:
+        """Create the llm_cache table if init_db() has not (scripts, tests)."""
+        if not self._table_ready:
+            LLMCacheEntry.__table__.create(bind=db.get_bind(), checkfirst=True)
+            self._table_ready = True
+
+    def _spill(self, entries: list) -> None:
+        if not self.spill:
+            return
+        db = None
+        try:
+            db = self._session_factory()
+            self._ensure_table(db)
+            for key, namespace, value, vector in entries:
+                row = db.get(LLMCacheEntry, key)
+                if row is None:
+                    row = LLMCacheEntry(key=key, namespace=namespace)
+                    db.add(row)
+                row.response = orjson.dumps(value).decode()
+                if vector is not None:
+                    row.embedding = self._vector_bytes(vector)
+            db.commit()
+        except Exception as e:
+            self._log_spill_error(e)
+        finally:
+            if db is not None:
+                db.close()
+
+    def _spilled_get(self, key: str) -> Any:
+        if not self.spill:
+            return None
+        db = None
+        try:
+            db = self._session_factory()
+            self._ensure_table(db)
+            row = db.get(LLMCacheEntry, key)
+            return orjson.loads(row.response) if row is not None else None
+        except Exception as e:
+            self._log_spill_error(e)
+            return None
+        finally:
+            if db is not None:
+                db.close()
+
+    # --- Semantic tier ---
+
+    def _embed(self, prompt: str):
+        model = _embedder()
+        if model is None:
+            return None
+        return model.encode(prompt, normalize_embeddings=True)
+
+    @staticmethod
+    def _vector_bytes(vector) -> bytes:
+        import numpy as np
+
+        return np.asarray(vector, dtype=np.float32).tobytes()
+
+    def _index(self, namespace: str, key: str, vector) -> None:
+        with self._lock:
+            vectors, keys = self._vectors.setdefault(namespace, ([], []))
+            vectors.append(vector)
+            keys.append(key)
+            if len(keys) > self.maxsize:
+                del vectors[0], keys[0]
+
+    def _load_spilled_vectors(self, namespace: str) -> None:
+        """Warm the semantic index of a namespace from SQLite, once."""
+        with self._lock:
+            if namespace in self._loaded_namespaces:
+                return
+            self._loaded_namespaces.add(namespace)
+        if not self.spill:
+            return
+        import numpy as np
+
+        db = None
+        try:
+            db = self._session_factory()
+            self._ensure_table(db)
+            rows = (
+                db.query(LLMCacheEntry.key, LLMCacheEntry.embedding)
+                .filter(LLMCacheEntry.namespace == namespace, LLMCacheEntry.embedding.isnot(None))
+                .order_by(LLMCacheEntry.created_at.desc())
+                .limit(self.maxsize)
+                .all()
+            )
+        except Exception as e:
+            self._log_spill_error(e)
+            return
+        finally:
+            if db is not None:
+                db.close()
+        for key, blob in reversed(rows):
+            self._index(namespace, key, np.frombuffer(blob, dtype=np.float32))
+
+    def _semantic_get(self, namespace: str, prompt: str) -> Any:
+        query = self._embed(prompt)
+        if query is None:
+            return None
+        self._load_spilled_vectors(namespace)
+        with self._lock:
+            vectors, keys = self._vectors.get(namespace, ([], []))
+            vectors, keys = list(vectors), list(keys)
+        if not vectors:
+            return None
+
+        import numpy as np
+
+        # Flat inner-product search; vectors are normalized so this is cosine
+        sims = np.asarray(vectors) @ query
+        best = int(np.argmax(sims))
+        if sims[best] < self.threshold:
+            return None
+        with self._lock:
+            entry = self._entries.get(keys[best])
+        if entry is not None:
+            return entry[1]
+        # The exact entry may have been evicted to SQLite since it was indexed
+        return self._spilled_get(keys[best])
+
+
+llm_cache = LLMResponseCache(semantic=LLM_SEMANTIC_CACHE, spill=LLM_CACHE_SPILL)
+
+
+def cached_llm(
+    kind: str,
+    resolve_system: Optional[Callable[[str], str]] = None,
+    cache: Optional[LLMResponseCache] = None,
+):
+    """
+    Decorator that serves repeated LLM requests from cache (default: llm_cache).
+
+    Works on both the sync and async generate_* helpers. Only successful
+    responses are stored; errors always propagate to the caller. A response
+    the caller then fails to decode must be dropped with the wrapper's
+    forget(*args, **kwargs) (awaitable for async helpers), or every retry of
+    the same request would get the same bad text back.
+    resolve_system maps a system_key argument to its system prompt, so the
+    namespace digests the prompt text rather than the key.
+    """
+
+    store = cache if cache is not None else llm_cache
+
+    def decorator(func):
+        signature = inspect.signature(func)
+
+        def cache_keys(args, kwargs):
+            bound = signature.bind(*args, **kwargs)
+            bound.apply_defaults()
+            params = dict(bound.arguments)
+            prompt = params.pop("prompt")
+            system = params.pop("system_instruction") or ""
+            system_key = params.pop("system_key", None)
+            if system_key and resolve_system is not None:
+                system = resolve_system(system_key)
+            model_name = params.pop("model_name")
+            temperature = params.pop("temperature")
+            namespace = f"{kind}|{model_name}|{temperature}|{_digest(system)}"
+            extra = "|".join(f"{k}={v}" for k, v in sorted(params.items()))
+            return _digest(f"{namespace}|{extra}|{prompt}"), namespace, prompt
+
+        if inspect.iscoroutinefunction(func):
+            @functools.wraps(func)
+            async def async_wrapper(*args, **kwargs):
+                key, namespace, prompt = cache_keys(args, kwargs)
+                # The spill/semantic tiers block, so they run in a thread
+                cached = await store.aget(key, namespace, prompt)
+                if cached is not None:
+                    return cached
+                result = await func(*args, **kwargs)
+                await store.aput(key, namespace, prompt, result)
+                return result
+
+            async def aforget(*args, **kwargs):
+                await store.adiscard(cache_keys(args, kwargs)[0])
+
+            async_wrapper.forget = aforget
+            return async_wrapper
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            key, namespace, prompt = cache_keys(args, kwargs)
+            cached = store.get(key, namespace, prompt)
+            if cached is not None:
+                return cached
+            result = func(*args, **kwargs)
+            store.put(key, namespace, prompt, result)
+            return result
+
+        def forget(*args, **kwargs):
+            store.discard(cache_keys(args, kwargs)[0])
+
+        wrapper.forget = forget
+        return wrapper
+
+    return decorator
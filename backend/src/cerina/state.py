@@ -1,6 +1,6 @@
 import operator
 from typing import Annotated, List, Dict, Optional, Literal, Union, Any
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, ConfigDict, Field
 from datetime import datetime
 from uuid import uuid4
 
@@ -18,16 +18,66 @@ def merge_reviews(current: List["Review"], new: List["Review"]) -> List["Review"
         
     Returns:
         Combined list of all reviews
+
+    The inputs are never mutated: LangGraph's channel copies (used e.g. by
+    update_state and branch reads) share the current list object, so
+    extending it in place would merge the same reviews twice.
     """
-    if current is None:
-        current = []
-    if new is None:
-        new = []
+    if not new:
+        return current if current is not None else []
+    if not current:
+        return list(new)
     return current + new
 
+def merge_scratchpads(
+    current: Union["AgentScratchpad", Dict[str, Any], None],
+    new: Union["AgentScratchpad", Dict[str, Any], None],
+) -> "AgentScratchpad":
+    """
+    Reducer for the scratchpads field.
+    Agents return only the notes they add, e.g.
+    {"scratchpads": {"notes": {"IntentInterpreter": "..."}}}, and this reducer
+    merges them into the existing notes (later keys win), the same way
+    merge_reviews lets each critic return just its own review.
+    """
+    def notes_of(value) -> Dict[str, str]:
+        if value is None:
+            return {}
+        if isinstance(value, AgentScratchpad):
+            return value.notes
+        return value.get("notes") or {}
+
+    return AgentScratchpad(notes={**notes_of(current), **notes_of(new)})
+
+def merge_scores(
+    current: Union["ScoresBundle", Dict[str, Any], None],
+    new: Union["ScoresBundle", Dict[str, Any], None],
+) -> "ScoresBundle":
+    """
+    Reducer for the scores field.
+    Each critic returns only its own score, e.g. {"scores": {"safety": 0.9}};
+    scores it does not mention keep their most recent value.
+    """
+    def scores_of(value) -> Dict[str, Any]:
+        if value is None:
+            return {}
+        if isinstance(value, ScoresBundle):
+            return value.model_dump(exclude_none=True)
+        return {key: score for key, score in value.items() if score is not None}
+
+    return ScoresBundle(**{**scores_of(current), **scores_of(new)})
+
 # --- Data Models ---
 
+# LangGraph rebuilds FoundryState from its channels before every node. Already
+# built Reviews/Drafts are then taken as-is instead of being revalidated
+# (pinned here so a pydantic default change can't make that O(reviews) per
+# hop), and attribute writes are never validated.
+STATE_MODEL_CONFIG = ConfigDict(validate_assignment=False, revalidate_instances="never")
+
 class Review(BaseModel):
+    model_config = STATE_MODEL_CONFIG
+
     id: str = Field(default_factory=lambda: str(uuid4()))
     agent_name: str
     target_draft_id: str
@@ -40,6 +90,8 @@ class Review(BaseModel):
     rationale: str
 
 class Draft(BaseModel):
+    model_config = STATE_MODEL_CONFIG
+
     id: str = Field(default_factory=lambda: str(uuid4()))
     content: str
     created_at: datetime = Field(default_factory=datetime.now)
@@ -47,6 +99,22 @@ class Draft(BaseModel):
     parent_draft_id: Optional[str] = None
     version_number: int = 1
 
+class ScoresBundle(BaseModel):
+    model_config = STATE_MODEL_CONFIG
+
+    # Latest score per reviewer, kept out of the Review list for the gates
+    safety: Optional[float] = None
+    empathy: Optional[float] = None
+    clinical: Optional[float] = None
+
+    def passes(self, safety: float, empathy: float, clinical: float) -> bool:
+        """True when every score is present and meets its threshold."""
+        return (
+            self.safety is not None and self.safety >= safety
+            and self.empathy is not None and self.empathy >= empathy
+            and self.clinical is not None and self.clinical >= clinical
+        )
+
 class AgentScratchpad(BaseModel):
     # Using a dict to store freeform notes per agent: {"SafetyGuardian": "Detected risk..."}
     notes: Dict[str, str] = Field(default_factory=dict)
@@ -54,6 +122,8 @@ class AgentScratchpad(BaseModel):
 # --- Graph State ---
 
 class FoundryState(BaseModel):
+    model_config = STATE_MODEL_CONFIG
+
     # Session Identity
     session_id: str = Field(default_factory=lambda: str(uuid4()))
     user_intent: str
@@ -73,6 +143,9 @@ class FoundryState(BaseModel):
     safety_score: Optional[float] = None
     empathy_score: Optional[float] = None
     clinical_score: Optional[float] = None
+    # Same scores bundled for the supervisor gates (see merge_scores); the flat
+    # fields above stay for the API and UI.
+    scores: Annotated[ScoresBundle, merge_scores] = Field(default_factory=ScoresBundle)
 
     # Flow Control
     iteration: int = 0
@@ -92,7 +165,8 @@ class FoundryState(BaseModel):
     approve_after_revision: bool = False
 
     error: Optional[str] = None
-    scratchpads: AgentScratchpad = Field(default_factory=AgentScratchpad)
+    # Notes per agent; nodes return only their delta (see merge_scratchpads)
+    scratchpads: Annotated[AgentScratchpad, merge_scratchpads] = Field(default_factory=AgentScratchpad)
 
     # Helper to easily add a note
     def add_note(self, agent: str, note: str):
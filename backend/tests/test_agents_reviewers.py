@@ -3,6 +3,7 @@ from cerina.state import new_session_state, FoundryState, Draft
 from cerina.agents.safety import run_safety_guardian
 from cerina.agents.empathy import run_empathy_tone_agent
 from cerina.agents.clinical import run_clinical_critic
+from cerina.agents.combined import run_combined_critic
 from cerina.agents.base import now_utc
 
 @pytest.fixture
@@ -16,8 +17,9 @@ def state_with_draft():
     )
     return state
 
-def test_safety_guardian(state_with_draft):
-    update = run_safety_guardian(state_with_draft)
+@pytest.mark.asyncio
+async def test_safety_guardian(state_with_draft):
+    update = await run_safety_guardian(state_with_draft)
     
     # Check Update content
     assert "safety_score" in update
@@ -27,22 +29,75 @@ def test_safety_guardian(state_with_draft):
     
     # Simulate Unsafe
     state_with_draft.current_draft.content = "This text is unsafe."
-    update_unsafe = run_safety_guardian(state_with_draft)
+    update_unsafe = await run_safety_guardian(state_with_draft)
     assert update_unsafe["safety_score"] < 0.5
 
-def test_empathy_agent(state_with_draft):
-    update = run_empathy_tone_agent(state_with_draft)
+@pytest.mark.asyncio
+async def test_empathy_agent(state_with_draft):
+    update = await run_empathy_tone_agent(state_with_draft)
     
     assert "empathy_score" in update
     assert update["empathy_score"] > 0
     assert len(update["reviews"]) == 1
     assert update["reviews"][0].agent_name == "EmpathyToneAgent"
 
-def test_clinical_critic(state_with_draft):
-    update = run_clinical_critic(state_with_draft)
+@pytest.mark.asyncio
+async def test_clinical_critic(state_with_draft):
+    update = await run_clinical_critic(state_with_draft)
     
     assert "clinical_score" in update
     assert update["clinical_score"] > 0
     assert len(update["reviews"]) == 1
     assert update["reviews"][0].agent_name == "ClinicalCritic"
 
+@pytest.mark.asyncio
+async def test_combined_critic(state_with_draft):
+    update = await run_combined_critic(state_with_draft)
+
+    assert {"safety_score", "empathy_score", "clinical_score"} <= update.keys()
+    assert [r.agent_name for r in update["reviews"]] == [
+        "SafetyGuardian", "EmpathyToneAgent", "ClinicalCritic"
+    ]
+    assert all(r.target_draft_id == state_with_draft.current_draft.id for r in update["reviews"])
+
+@pytest.mark.asyncio
+async def test_reviewer_reuses_review_of_identical_draft(state_with_draft, monkeypatch):
+    previous = state_with_draft.current_draft
+    first = await run_safety_guardian(state_with_draft)
+
+    # A revision that reproduces the reviewed draft verbatim
+    state_with_draft.draft_history = [previous]
+    state_with_draft.reviews = first["reviews"]
+    state_with_draft.current_draft = previous.model_copy(update={"id": "draft-v2"})
+
+    async def no_llm(**kwargs):
+        raise AssertionError("reviewer called the LLM for an unchanged draft")
+
+    monkeypatch.setattr("cerina.agents.safety.agenerate_structured", no_llm)
+    second = await run_safety_guardian(state_with_draft)
+
+    reused = second["reviews"][0]
+    assert reused.target_draft_id == "draft-v2"
+    assert reused.id != first["reviews"][0].id
+    assert reused.rationale == first["reviews"][0].rationale
+    assert second["safety_score"] == first["safety_score"]
+
+def test_review_excerpt_falls_back_when_tiktoken_cannot_load(monkeypatch):
+    """Offline hosts fail tiktoken's BPE download; excerpts use the char heuristic instead."""
+    import sys
+    import types
+    from cerina.agents import llm
+
+    def offline(_encoding):
+        raise ConnectionError("no network")
+
+    monkeypatch.setitem(sys.modules, "tiktoken", types.SimpleNamespace(get_encoding=offline))
+    llm._encoder.cache_clear()
+    try:
+        draft = "x" * (llm.REVIEW_DRAFT_MAX_TOKENS * llm.CHARS_PER_TOKEN * 2)
+        excerpt = llm.review_excerpt(draft)
+    finally:
+        llm._encoder.cache_clear()
+
+    assert llm.TRUNCATION_MARKER in excerpt
+    assert len(excerpt) < len(draft)
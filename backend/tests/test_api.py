@@ -0,0 +1,197 @@
+from datetime import datetime
+
+import pytest
+from fastapi.testclient import TestClient
+from langgraph.checkpoint.memory import MemorySaver
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+import cerina.agents.base as agents_base
+import cerina.api as api
+from cerina.agents.base import flush_run_logs
+from cerina.db import Base, RUN_SESSION_TRIGGER, RunSession, get_db
+from cerina.graph import build_graph
+
+INTENT = "Create a CBT exposure hierarchy for fear of dogs"
+
+
+@pytest.fixture
+def db_factory(monkeypatch, tmp_path):
+    """
+    A per-test run-log database in place of cerina_graph.db. Queued agent
+    run records are flushed on both sides, so the background writer never
+    writes one test's runs into another's database.
+    """
+    flush_run_logs()
+    engine = create_engine(
+        f"sqlite:///{tmp_path / 'runs.db'}",
+        connect_args={"check_same_thread": False},
+    )
+    Base.metadata.create_all(bind=engine)
+    with engine.begin() as conn:
+        conn.execute(RUN_SESSION_TRIGGER)
+    factory = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+    monkeypatch.setattr(api, "SessionLocal", factory)
+    monkeypatch.setattr(agents_base, "SessionLocal", factory)
+
+    def override_get_db():
+        db = factory()
+        try:
+            yield db
+        finally:
+            db.close()
+
+    api.app.dependency_overrides[get_db] = override_get_db
+    yield factory
+    flush_run_logs()
+    api.app.dependency_overrides.pop(get_db, None)
+    engine.dispose()
+
+
+@pytest.fixture
+def client(monkeypatch, db_factory):
+    """A TestClient whose app checkpoints in memory instead of SQLite."""
+    async def fake_get_graph():
+        return build_graph(checkpointer=MemorySaver())
+
+    async def fake_close_graph():
+        pass
+
+    monkeypatch.setattr(api, "get_graph", fake_get_graph)
+    monkeypatch.setattr(api, "close_graph", fake_close_graph)
+    with TestClient(api.app) as test_client:
+        yield test_client
+
+
+def _start_session(client):
+    response = client.post("/sessions", json={"user_intent": INTENT})
+    assert response.status_code == 200
+    body = response.json()
+    if body["status"] != "AWAITING_HUMAN":
+        pytest.skip(f"session stopped at {body['status']} before human review")
+    return body["session_id"]
+
+
+def _state(client, session_id):
+    response = client.get(f"/sessions/{session_id}/state")
+    assert response.status_code == 200
+    return response.json()
+
+
+def _approve(client, session_id, action, **extra):
+    response = client.post(
+        f"/sessions/{session_id}/human_approve",
+        json={"action": action, **extra},
+    )
+    assert response.status_code == 200
+    return response.json()
+
+
+def test_approve_final_ends_approved(client):
+    session_id = _start_session(client)
+    before = _state(client, session_id)
+
+    assert _approve(client, session_id, "APPROVE_FINAL")["status"] == "APPROVED"
+
+    after = _state(client, session_id)
+    assert after["status"] == "APPROVED"
+    assert after["iteration"] == before["iteration"]
+    assert after["reviews"][-1]["agent_name"] == "HumanReviewer"
+
+
+def test_reject_ends_rejected(client):
+    session_id = _start_session(client)
+
+    assert _approve(client, session_id, "REJECT", comments="Not usable")["status"] == "REJECTED"
+
+    after = _state(client, session_id)
+    assert after["status"] == "REJECTED"
+    assert after["reviews"][-1]["rationale"] == "Not usable"
+
+
+def test_request_revision_returns_to_human(client):
+    session_id = _start_session(client)
+    before = _state(client, session_id)
+
+    assert _approve(client, session_id, "REQUEST_REVISION")["status"] == "AWAITING_HUMAN"
+
+    after = _state(client, session_id)
+    assert after["status"] == "AWAITING_HUMAN"
+    assert after["iteration"] == before["iteration"] + 1
+    assert len(after["reviews"]) > len(before["reviews"]) + 1
+
+
+def test_approve_continue_revises_then_approves(client):
+    session_id = _start_session(client)
+    before = _state(client, session_id)
+
+    assert _approve(client, session_id, "APPROVE_CONTINUE")["status"] == "APPROVED"
+
+    after = _state(client, session_id)
+    assert after["status"] == "APPROVED"
+    assert after["iteration"] == before["iteration"] + 1
+
+
+def test_approve_without_new_content_keeps_draft(client):
+    session_id = _start_session(client)
+    draft = _state(client, session_id)["current_draft"]
+
+    _approve(client, session_id, "APPROVE_FINAL", new_content=None)
+
+    assert _state(client, session_id)["current_draft"] == draft
+
+
+def test_approve_with_new_content_edits_draft(client):
+    session_id = _start_session(client)
+
+    _approve(client, session_id, "APPROVE_FINAL", new_content="Edited by a clinician")
+
+    assert _state(client, session_id)["current_draft"]["content"] == "Edited by a clinician"
+
+
+def test_approve_unknown_session_is_404(client):
+    response = client.post("/sessions/missing/human_approve", json={"action": "APPROVE_FINAL"})
+    assert response.status_code == 404
+
+
+def test_session_state_fields(client):
+    session_id = _start_session(client)
+
+    state = _state(client, session_id)
+
+    assert state["session_id"] == session_id
+    assert state["user_intent"] == INTENT
+    assert state["current_draft"]["content"]
+    for field in ("reviews", "draft_history", "safety_score", "empathy_score", "clinical_score"):
+        assert field in state
+
+
+def test_session_state_unknown_session_is_404(client):
+    assert client.get("/sessions/missing/state").status_code == 404
+
+
+def test_list_sessions_pages_through_shared_timestamps(client, db_factory):
+    started_at = datetime(2026, 1, 1, 12, 0, 0)
+    with db_factory() as db:
+        db.add_all(
+            RunSession(id=f"s{i}", session_id=f"s{i}", started_at=started_at, status="APPROVED")
+            for i in range(5)
+        )
+        db.add(RunSession(id="older", session_id="older", started_at=datetime(2025, 1, 1), status="FAILED"))
+        db.commit()
+
+    seen = []
+    params = {"limit": 2}
+    while True:
+        page = client.get("/sessions", params=params).json()
+        assert len(page["items"]) <= 2
+        seen.extend(item["session_id"] for item in page["items"])
+        if page["next_before"] is None:
+            break
+        params["before"] = page["next_before"]
+
+    assert seen == ["s4", "s3", "s2", "s1", "s0", "older"]
+
+
+def test_list_sessions_rejects_bad_cursor(client):
+    assert client.get("/sessions", params={"before": "yesterday"}).status_code == 422
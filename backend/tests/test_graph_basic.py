@@ -49,3 +49,106 @@ async def test_graph_fail_fast():
     
     assert final_state.status == "AWAITING_HUMAN"
     assert final_state.iteration >= 1
+
+@pytest.mark.asyncio
+async def test_graph_combined_critic():
+    """The combined-critic graph variant compiles and reaches the same outcome."""
+    from langgraph.checkpoint.memory import MemorySaver
+    from cerina.graph import build_graph
+
+    graph = build_graph(checkpointer=MemorySaver(), combined_critic=True)
+    initial_state = new_session_state(
+        session_id="test-session-combined",
+        user_intent="Simple test"
+    )
+
+    result = await graph.ainvoke(initial_state, config={"configurable": {"thread_id": "test-session-combined"}})
+
+    assert result["status"] == "AWAITING_HUMAN"
+    assert len(result["reviews"]) >= 3
+
+@pytest.mark.asyncio
+async def test_graph_merges_scratchpad_notes():
+    """Agent notes are merged into existing scratchpads rather than replacing them."""
+    from langgraph.checkpoint.memory import MemorySaver
+    from cerina.graph import build_graph
+
+    graph = build_graph(checkpointer=MemorySaver())
+    initial_state = new_session_state(
+        session_id="test-session-notes",
+        user_intent="Simple test"
+    )
+    initial_state.add_note("Clinician", "Prefers short sessions")
+
+    result = await graph.ainvoke(initial_state, config={"configurable": {"thread_id": "test-session-notes"}})
+
+    notes = result["scratchpads"].notes
+    assert notes["Clinician"] == "Prefers short sessions"
+    assert "IntentInterpreter" in notes
+
+@pytest.mark.asyncio
+async def test_graph_runs_reviewers_concurrently(monkeypatch):
+    """The three critics fan out in one superstep, so their LLM calls overlap."""
+    import asyncio
+    from langgraph.checkpoint.memory import MemorySaver
+    from cerina.agents import llm
+    from cerina.graph import build_graph
+
+    in_flight = 0
+    peak = 0
+
+    async def slow_completion(prompt, system_instruction=None, **kwargs):
+        nonlocal in_flight, peak
+        in_flight += 1
+        peak = max(peak, in_flight)
+        await asyncio.sleep(0.05)
+        in_flight -= 1
+        return "{}"
+
+    monkeypatch.setattr(llm, "_acomplete_json", slow_completion)
+    graph = build_graph(checkpointer=MemorySaver(), combined_critic=False)
+    initial_state = new_session_state(
+        session_id="test-session-parallel",
+        user_intent="Simple test"
+    )
+
+    await graph.ainvoke(initial_state, config={"configurable": {"thread_id": "test-session-parallel"}})
+
+    assert peak == 3
+
+@pytest.mark.asyncio
+async def test_safety_gate_skips_other_critics(monkeypatch):
+    """With the safety gate, a critically unsafe draft fails without empathy/clinical calls."""
+    from langgraph.checkpoint.memory import MemorySaver
+    from cerina.agents import llm
+    from cerina.graph import build_graph
+
+    called = []
+
+    async def unsafe_completion(prompt, system_instruction=None, system_key=None, **kwargs):
+        called.append(system_key)
+        return '{"safety_score": 0.1}'
+
+    monkeypatch.setattr(llm, "_acomplete_json", unsafe_completion)
+    graph = build_graph(checkpointer=MemorySaver(), combined_critic=False, safety_gate=True)
+    initial_state = new_session_state(
+        session_id="test-session-gate",
+        user_intent="Simple test"
+    )
+
+    result = await graph.ainvoke(initial_state, config={"configurable": {"thread_id": "test-session-gate"}})
+
+    assert result["status"] == "FAILED"
+    assert called == ["SafetyGuardian"]
+
+def test_merge_reviews_does_not_mutate_inputs():
+    """Channel copies share the reviews list, so the reducer must not extend it."""
+    from cerina.state import Review, merge_reviews
+
+    current = [Review(agent_name="SafetyGuardian", target_draft_id="d1", summary="s", rationale="r")]
+    new = [Review(agent_name="HumanReviewer", target_draft_id="d1", summary="s", rationale="r")]
+
+    merged = merge_reviews(current, new)
+
+    assert [r.agent_name for r in merged] == ["SafetyGuardian", "HumanReviewer"]
+    assert len(current) == 1
@@ -0,0 +1,26 @@
+from cerina.state import new_session_state
+from cerina.agents.intent import _fast_classify, run_intent_interpreter
+
+
+def test_fast_classify_resolves_common_request():
+    result = _fast_classify("Create a CBT exposure hierarchy for social anxiety", None)
+
+    assert result.target_condition == "social anxiety"
+    assert "exposure" in result.recommended_approach.lower()
+
+
+def test_fast_classify_defers_ambiguous_or_risky_requests():
+    assert _fast_classify("Simple test", None) is None
+    assert _fast_classify("Exposure plan for panic and social anxiety", None) is None
+    assert _fast_classify("Exposure hierarchy for panic after self-harm", None) is None
+    assert _fast_classify("Exposure hierarchy for panic", "Patient is 15, on SSRIs") is None
+
+
+def test_intent_interpreter_records_path():
+    state = new_session_state("test-intent", "Create a CBT exposure hierarchy for fear of dogs")
+    update = run_intent_interpreter(state)
+
+    notes = update["scratchpads"]["notes"]
+    assert notes["IntentInterpreter:path"] == "fast"
+    assert notes["IntentInterpreter"].startswith("Target: specific phobia")
+    assert update["status"] == "DRAFTING"
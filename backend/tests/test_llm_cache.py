@@ -0,0 +1,93 @@
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from cerina.db import Base
+from cerina.llm_cache import LLMResponseCache, cached_llm
+
+
+def test_cache_lru_eviction():
+    cache = LLMResponseCache(maxsize=2)
+    cache.put("a", "ns", "p1", {"v": 1})
+    cache.put("b", "ns", "p2", {"v": 2})
+    assert cache.get("a", "ns", "p1") == {"v": 1}  # refreshes "a"
+    cache.put("c", "ns", "p3", {"v": 3})
+
+    assert cache.get("b", "ns", "p2") is None
+    assert cache.get("a", "ns", "p1") == {"v": 1}
+    assert cache.get("c", "ns", "p3") == {"v": 3}
+
+
+@pytest.mark.asyncio
+async def test_cached_llm_skips_repeat_calls():
+    calls = []
+
+    @cached_llm("json", cache=LLMResponseCache())
+    async def fake_generate(prompt, system_instruction=None, model_name="m", temperature=0.2):
+        calls.append(prompt)
+        return {"prompt": prompt}
+
+    assert await fake_generate("draft", system_instruction="rubric") == {"prompt": "draft"}
+    assert await fake_generate("draft", system_instruction="rubric") == {"prompt": "draft"}
+    # Different system prompt or temperature is a different cache entry
+    await fake_generate("draft", system_instruction="rubric v2")
+    await fake_generate("draft", system_instruction="rubric", temperature=0.7)
+
+    assert len(calls) == 3
+
+
+def test_cache_spills_evicted_entries_to_sqlite():
+    engine = create_engine(
+        "sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool
+    )
+    Base.metadata.create_all(bind=engine)
+    cache = LLMResponseCache(maxsize=1, spill=True, session_factory=sessionmaker(bind=engine))
+
+    cache.put("a", "ns", "p1", '{"v": 1}')
+    cache.put("b", "ns", "p2", '{"v": 2}')  # evicts "a" to SQLite
+
+    assert "a" not in cache._entries
+    assert cache.get("a", "ns", "p1") == '{"v": 1}'
+    assert cache.get("missing", "ns", "p3") is None
+
+
+@pytest.mark.asyncio
+async def test_async_spill_creates_table_and_runs_off_loop():
+    # No create_all: the spill tier creates llm_cache on first use
+    engine = create_engine(
+        "sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool
+    )
+    cache = LLMResponseCache(maxsize=1, spill=True, session_factory=sessionmaker(bind=engine))
+
+    await cache.aput("a", "ns", "p1", {"v": 1})
+    await cache.aput("b", "ns", "p2", {"v": 2})  # evicts "a" to SQLite
+
+    assert "a" not in cache._entries
+    assert await cache.aget("a", "ns", "p1") == {"v": 1}
+    assert not cache._spill_error_logged
+
+
+@pytest.mark.asyncio
+async def test_undecodable_response_is_not_replayed(monkeypatch):
+    """A truncated JSON response is dropped from the cache, so a retry reaches the LLM."""
+    from cerina.agents import llm
+    from cerina.agents.schemas import SafetyReviewOut
+
+    replies = iter(['{"safety_score": 0.9, "summ', '{"safety_score": 0.9}'])
+    calls = []
+
+    @cached_llm("json", cache=LLMResponseCache())
+    async def fake_complete(prompt, system_instruction=None, model_name="m", temperature=0.2):
+        calls.append(prompt)
+        return next(replies)
+
+    monkeypatch.setattr(llm, "_acomplete_json", fake_complete)
+
+    with pytest.raises(Exception):
+        await llm.agenerate_structured("draft", SafetyReviewOut, system_instruction="rubric")
+    result = await llm.agenerate_structured("draft", SafetyReviewOut, system_instruction="rubric")
+    again = await llm.agenerate_structured("draft", SafetyReviewOut, system_instruction="rubric")
+
+    assert result.safety_score == again.safety_score == 0.9
+    assert len(calls) == 2
@@ -0,0 +1,38 @@
+from cerina.agents.schemas import (
+    ClinicalReviewOut,
+    CombinedReviewOut,
+    FALLBACK_SAFETY_SCORE,
+    SafetyReviewOut,
+)
+
+
+def test_review_schema_clamps_and_coerces():
+    out = ClinicalReviewOut.model_validate(
+        {"clinical_score": "1.7", "strengths": "Clear steps", "gaps": None, "summary": "  "}
+    )
+
+    assert out.clinical_score == 1.0
+    assert out.strengths == ["Clear steps"]
+    assert out.gaps == []
+    assert out.summary == "Clinical assessment"
+
+
+def test_review_schema_falls_back_on_bad_values():
+    out = SafetyReviewOut.model_validate({"safety_score": "high", "concerns": ["", None, "Pacing"]})
+
+    assert out.safety_score == FALLBACK_SAFETY_SCORE
+    assert out.concerns == ["Pacing"]
+
+
+def test_combined_schema_tolerates_missing_sections():
+    out = CombinedReviewOut.model_validate({"empathy": {"empathy_score": 0.7}})
+
+    assert out.empathy.empathy_score == 0.7
+    assert out.safety.safety_score == FALLBACK_SAFETY_SCORE
+
+
+def test_schema_decodes_raw_json():
+    out = CombinedReviewOut.model_validate_json('{"clinical": {"clinical_score": "0.95", "gaps": "Relapse plan"}}')
+
+    assert out.clinical.clinical_score == 0.95
+    assert out.clinical.gaps == ["Relapse plan"]
@@ -1,5 +1,5 @@
 import React, { useState } from 'react';
-import { useQuery, useMutation, useQueryClient } from '@tanstack/react-query';
+import { useInfiniteQuery, useMutation, useQueryClient } from '@tanstack/react-query';
 import { apiClient } from '../api/client';
 import { useNavigate } from 'react-router-dom';
 import { StatsChart } from '../components/StatsChart';
@@ -26,10 +26,18 @@ interface Session {
   created_at: string | null;
 }
 
+interface SessionPage {
+  items: Session[];
+  next_before: string | null;
+}
+
 const INITIAL_DISPLAY_COUNT = 10;
 
-const fetchSessions = async (): Promise<Session[]> => {
-  const response = await apiClient.get<Session[]>('/sessions');
+// One page of /sessions; pass the previous page's next_before to get older ones
+const fetchSessions = async ({ pageParam }: { pageParam: string | null }): Promise<SessionPage> => {
+  const response = await apiClient.get<SessionPage>('/sessions', {
+    params: pageParam ? { before: pageParam } : undefined,
+  });
   return response.data;
 };
 
@@ -40,10 +48,20 @@ export const SessionsPage: React.FC = () => {
   const navigate = useNavigate();
   const queryClient = useQueryClient();
 
-  const { data: sessions, isLoading, error } = useQuery({
+  const {
+    data,
+    isLoading,
+    error,
+    fetchNextPage,
+    hasNextPage,
+    isFetchingNextPage,
+  } = useInfiniteQuery({
     queryKey: ['sessions'],
-    queryFn: fetchSessions
+    queryFn: fetchSessions,
+    initialPageParam: null as string | null,
+    getNextPageParam: (lastPage) => lastPage.next_before,
   });
+  const sessions = data?.pages.flatMap((page) => page.items);
 
   const createMutation = useMutation({
     mutationFn: (data: { intent: string, context?: string }) => 
@@ -63,7 +81,7 @@ export const SessionsPage: React.FC = () => {
   const displayedSessions = showAll 
     ? sessions 
     : sessions?.slice(0, INITIAL_DISPLAY_COUNT);
-  const hasMore = (sessions?.length || 0) > INITIAL_DISPLAY_COUNT;
+  const hasMore = (sessions?.length || 0) > INITIAL_DISPLAY_COUNT || hasNextPage;
   const hiddenCount = (sessions?.length || 0) - INITIAL_DISPLAY_COUNT;
 
   return (
@@ -142,7 +160,7 @@ export const SessionsPage: React.FC = () => {
             action={
               sessions && sessions.length > 0 && (
                 <span className="text-xs text-gray-400 font-medium">
-                  {sessions.length} session{sessions.length !== 1 ? 's' : ''}
+                  {sessions.length}{hasNextPage ? '+' : ''} session{sessions.length !== 1 ? 's' : ''}
                 </span>
               )
             }
@@ -213,7 +231,19 @@ export const SessionsPage: React.FC = () => {
             
             {/* Expand/Collapse Button */}
             {hasMore && (
-              <div className="p-4 border-t border-gray-100 text-center bg-gray-50/50">
+              <div className="p-4 border-t border-gray-100 text-center bg-gray-50/50 space-x-2">
+                {/* Older sessions are fetched a page at a time once expanded */}
+                {showAll && hasNextPage && (
+                  <Button
+                    variant="subtle"
+                    size="sm"
+                    isLoading={isFetchingNextPage}
+                    onClick={() => fetchNextPage()}
+                  >
+                    Load Older Sessions
+                    <ChevronDownIcon />
+                  </Button>
+                )}
                 <Button
                   variant="subtle"
                   size="sm"
@@ -226,7 +256,7 @@ export const SessionsPage: React.FC = () => {
                     </>
                   ) : (
                     <>
-                      Show {hiddenCount} More
+                      Show {hiddenCount > 0 ? `${hiddenCount} ` : ''}More
                       <ChevronDownIcon />
                     </>
                   )}
@@ -6,6 +6,7 @@ Exposes the multi-agent CBT protocol generation system as an MCP tool.
 
 import asyncio
 import httpx
+import orjson
 from typing import Optional
 from mcp.server import Server
 from mcp.server.stdio import stdio_server
@@ -14,6 +15,44 @@ from mcp.types import Tool, TextContent
 # Backend API Configuration
 BACKEND_URL = "http://127.0.0.1:8000"
 
+# Status polling: back off from POLL_INITIAL_DELAY by POLL_BACKOFF per poll,
+# capped at POLL_MAX_DELAY, for at most POLL_TIMEOUT seconds in total
+POLL_INITIAL_DELAY = 0.1
+POLL_BACKOFF = 1.5
+POLL_MAX_DELAY = 2.0
+POLL_TIMEOUT = 120.0
+TERMINAL_STATUSES = ("APPROVED", "FAILED", "REJECTED")
+
+
+def _fmt(score) -> str:
+    """A score to two decimals, or N/A when the reviewer gave none."""
+    return f"{score:.2f}" if isinstance(score, (int, float)) else "N/A"
+
+
+# One pooled client for every tool call, so polls reuse keep-alive
+# connections instead of reconnecting per session
+_client: Optional[httpx.AsyncClient] = None
+
+
+def get_client() -> httpx.AsyncClient:
+    """The shared backend client, created on first use."""
+    global _client
+    if _client is None or _client.is_closed:
+        _client = httpx.AsyncClient(
+            base_url=BACKEND_URL,
+            timeout=120.0,
+            limits=httpx.Limits(max_keepalive_connections=32),
+        )
+    return _client
+
+
+async def close_client() -> None:
+    """Close the shared backend client (call on shutdown)."""
+    global _client
+    if _client is not None:
+        await _client.aclose()
+        _client = None
+
 # Create MCP Server
 server = Server("cerina-protocol-foundry")
 
@@ -52,6 +91,37 @@ async def list_tools() -> list[Tool]:
     ]
 
 
+def format_result(final_state: dict) -> str:
+    """
+    The tool's markdown report for a finished session's /state payload.
+    current_draft is null when a session ends without a draft (e.g. FAILED
+    or REJECTED early).
+    """
+    protocol_content = (final_state.get("current_draft") or {}).get("content", "No protocol generated")
+    safety_score = final_state.get("safety_score")
+    empathy_score = final_state.get("empathy_score")
+    clinical_score = final_state.get("clinical_score")
+    iteration_count = final_state.get("iteration", 0)
+    final_status = final_state.get("status", "UNKNOWN")
+    
+    response_text = f"""# CBT Protocol Generation Result
+
+## Status: {final_status}
+
+## Scores
+- Safety: {_fmt(safety_score)}
+- Empathy: {_fmt(empathy_score)}
+- Clinical: {_fmt(clinical_score)}
+
+## Iterations: {iteration_count}
+
+## Protocol
+
+{protocol_content}
+"""
+    return response_text
+
+
 @server.call_tool()
 async def call_tool(name: str, arguments: dict) -> list[TextContent]:
     """Handle tool calls."""
@@ -65,88 +135,77 @@ async def call_tool(name: str, arguments: dict) -> list[TextContent]:
     if not prompt:
         raise ValueError("prompt is required")
     
-    async with httpx.AsyncClient(timeout=120.0) as client:
-        # 1. Create session
-        create_response = await client.post(
-            f"{BACKEND_URL}/sessions",
-            json={"user_intent": prompt, "user_context": context}
-        )
-        create_response.raise_for_status()
-        session_data = create_response.json()
-        session_id = session_data["session_id"]
-        status = session_data["status"]
-        
-        # 2. Poll until terminal state
-        max_polls = 60  # 2 minutes max
-        poll_interval = 2.0
-        
-        for _ in range(max_polls):
-            if status in ["APPROVED", "FAILED"]:
-                break
-            
-            if status == "AWAITING_HUMAN" and auto_approve:
-                # Auto-approve by calling human_approve endpoint
-                state_response = await client.get(f"{BACKEND_URL}/sessions/{session_id}/state")
-                state_response.raise_for_status()
-                state = state_response.json()
-                
-                current_content = state.get("current_draft", {}).get("content", "")
-                
-                approve_response = await client.post(
-                    f"{BACKEND_URL}/sessions/{session_id}/human_approve",
-                    json={
-                        "new_content": current_content,
-                        "action": "APPROVE_FINAL",
-                        "comments": "Auto-approved via MCP"
-                    }
-                )
-                approve_response.raise_for_status()
-                result = approve_response.json()
-                status = result.get("status", status)
-            else:
-                await asyncio.sleep(poll_interval)
-                state_response = await client.get(f"{BACKEND_URL}/sessions/{session_id}/state")
-                state_response.raise_for_status()
-                state = state_response.json()
-                status = state.get("status", status)
-        
-        # 3. Fetch final state
-        final_state_response = await client.get(f"{BACKEND_URL}/sessions/{session_id}/state")
-        final_state_response.raise_for_status()
-        final_state = final_state_response.json()
-        
-        # 4. Build response
-        protocol_content = final_state.get("current_draft", {}).get("content", "No protocol generated")
-        safety_score = final_state.get("safety_score")
-        empathy_score = final_state.get("empathy_score")
-        clinical_score = final_state.get("clinical_score")
-        iteration_count = final_state.get("iteration", 0)
-        final_status = final_state.get("status", "UNKNOWN")
-        
-        response_text = f"""# CBT Protocol Generation Result
-
-## Status: {final_status}
-
-## Scores
-- Safety: {safety_score:.2f if safety_score else 'N/A'}
-- Empathy: {empathy_score:.2f if empathy_score else 'N/A'}
-- Clinical: {clinical_score:.2f if clinical_score else 'N/A'}
-
-## Iterations: {iteration_count}
-
-## Protocol
-
-{protocol_content}
-"""
+    client = get_client()
+
+    # 1. Create session
+    create_response = await client.post(
+        "/sessions",
+        json={"user_intent": prompt, "user_context": context}
+    )
+    create_response.raise_for_status()
+    session_data = orjson.loads(create_response.content)
+    session_id = session_data["session_id"]
+    status = session_data["status"]
+    
+    # 2. Poll until terminal state. Polls start fast and back off, so a
+    # session that is nearly done is noticed quickly and a slow one is
+    # not polled every few hundred milliseconds.
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + POLL_TIMEOUT
+    delay = POLL_INITIAL_DELAY
+    
+    while loop.time() < deadline:
+        if status in TERMINAL_STATUSES:
+            break
         
-        return [TextContent(type="text", text=response_text)]
+        if status == "AWAITING_HUMAN" and auto_approve:
+            # Auto-approve by calling human_approve endpoint; new_content=None
+            # keeps the current draft, so no state fetch is needed first
+            approve_response = await client.post(
+                f"/sessions/{session_id}/human_approve",
+                json={
+                    "new_content": None,
+                    "action": "APPROVE_FINAL",
+                    "comments": "Auto-approved via MCP"
+                }
+            )
+            approve_response.raise_for_status()
+            result = orjson.loads(approve_response.content)
+            status = result.get("status", status)
+        else:
+            await asyncio.sleep(delay)
+            delay = min(POLL_MAX_DELAY, delay * POLL_BACKOFF)
+            state_response = await client.get(f"/sessions/{session_id}/state")
+            state_response.raise_for_status()
+            state = orjson.loads(state_response.content)
+            status = state.get("status", status)
+    
+    # 3. Fetch final state
+    final_state_response = await client.get(f"/sessions/{session_id}/state")
+    final_state_response.raise_for_status()
+    final_state = orjson.loads(final_state_response.content)
+    
+    # 4. Build response
+    response_text = format_result(final_state)
+    
+    return [TextContent(type="text", text=response_text)]
 
 
 async def main():
     """Run the MCP server."""
-    async with stdio_server() as (read_stream, write_stream):
-        await server.run(read_stream, write_stream, server.create_initialization_options())
+    try:
+        async with stdio_server() as (read_stream, write_stream):
+            await server.run(read_stream, write_stream, server.create_initialization_options())
+    finally:
+        await close_client()
 
 
 if __name__ == "__main__":
-    asyncio.run(main())
+    # uvloop where available (not on Windows); its scheduler and sockets are
+    # cheaper for the many small awaits around backend polls
+    try:
+        import uvloop
+    except ImportError:
+        asyncio.run(main())
+    else:
+        uvloop.run(main())
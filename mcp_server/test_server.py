@@ -0,0 +1,26 @@
+import pytest
+
+pytest.importorskip("mcp")
+
+from mcp_server.server import format_result
+
+
+def test_format_result_handles_null_draft():
+    text = format_result({"status": "FAILED", "current_draft": None, "safety_score": None})
+
+    assert "## Status: FAILED" in text
+    assert "No protocol generated" in text
+    assert "- Safety: N/A" in text
+
+
+def test_format_result_includes_draft_content():
+    text = format_result({
+        "status": "APPROVED",
+        "current_draft": {"content": "Step 1: breathe"},
+        "safety_score": 0.9,
+        "iteration": 2,
+    })
+
+    assert "Step 1: breathe" in text
+    assert "- Safety: 0.90" in text
+    assert "## Iterations: 2" in text